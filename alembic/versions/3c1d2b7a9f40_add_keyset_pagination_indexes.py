@@ -0,0 +1,30 @@
+"""Add keyset pagination indexes
+
+Revision ID: 3c1d2b7a9f40
+Revises: e88f6727ab4c
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1d2b7a9f40'
+down_revision: Union[str, Sequence[str], None] = 'e88f6727ab4c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'])
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_created_at_id', table_name='users')
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
@@ -0,0 +1,49 @@
+"""Add posts.user_id foreign key/index and user post counters
+
+Revision ID: 5d8b3f0e2a71
+Revises: 9a4e2c7d1b63
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d8b3f0e2a71'
+down_revision: Union[str, Sequence[str], None] = '9a4e2c7d1b63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_user_id', 'posts', ['user_id'])
+    # SQLite can only add a foreign key by rebuilding the table (which would also
+    # drop the full-text triggers) and does not enforce it by default; skip it there
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key('posts_user_id_fkey', 'posts', 'users', ['user_id'], ['id'])
+
+    op.add_column('users', sa.Column('post_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('last_post_at', sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE users SET "
+        "post_count = (SELECT COUNT(*) FROM posts WHERE posts.user_id = users.id), "
+        "last_post_at = (SELECT MAX(created_at) FROM posts WHERE posts.user_id = users.id)"
+    )
+    op.create_index('ix_users_post_count', 'users', ['post_count'])
+    op.create_index('ix_users_last_post_at', 'users', ['last_post_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_last_post_at', table_name='users')
+    op.drop_index('ix_users_post_count', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('last_post_at')
+        batch_op.drop_column('post_count')
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('posts_user_id_fkey', 'posts', type_='foreignkey')
+    op.drop_index('ix_posts_user_id', table_name='posts')
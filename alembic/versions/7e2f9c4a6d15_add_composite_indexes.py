@@ -0,0 +1,41 @@
+"""Add composite indexes for user posts, active users and email search
+
+Revision ID: 7e2f9c4a6d15
+Revises: 5d8b3f0e2a71
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2f9c4a6d15'
+down_revision: Union[str, Sequence[str], None] = '5d8b3f0e2a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_posts_user_id_created_at_id', 'posts',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')]
+    )
+    # The composite index starts with user_id, so the single-column one is redundant
+    op.drop_index('ix_posts_user_id', table_name='posts')
+    op.create_index('ix_users_is_active_id', 'users', ['is_active', 'id'])
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_users_email_trgm ON users USING gin (email gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_email_trgm")
+    op.drop_index('ix_users_is_active_id', table_name='users')
+    op.create_index('ix_posts_user_id', 'posts', ['user_id'])
+    op.drop_index('ix_posts_user_id_created_at_id', table_name='posts')
@@ -0,0 +1,31 @@
+"""Add users.updated_at
+
+Revision ID: 9a4e2c7d1b63
+Revises: 3c1d2b7a9f40
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e2c7d1b63'
+down_revision: Union[str, Sequence[str], None] = '3c1d2b7a9f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Existing profiles have not changed since they were created
+    op.execute("UPDATE users SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,32 @@
+"""Add lower(email) index for prefix search
+
+Revision ID: b3c5e8f1a2d4
+Revises: 7e2f9c4a6d15
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3c5e8f1a2d4'
+down_revision: Union[str, Sequence[str], None] = '7e2f9c4a6d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # text_pattern_ops so LIKE 'prefix%' can use the index under any collation
+        op.execute("CREATE INDEX ix_users_email_lower ON users (lower(email) text_pattern_ops)")
+    else:
+        op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_email_lower', table_name='users')
@@ -0,0 +1,67 @@
+"""Add post full-text search
+
+Revision ID: e88f6727ab4c
+Revises: f6f8f04da9cc
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from models import POSTS_FTS_POSTGRES_DDL, POSTS_FTS_SQLITE_DDL
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e88f6727ab4c'
+down_revision: Union[str, Sequence[str], None] = 'f6f8f04da9cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The DDL itself lives in models.py, which create_all runs for fresh databases
+SQLITE_UPGRADE = [
+    *POSTS_FTS_SQLITE_DDL,
+    # Backfill the index from the existing rows
+    "INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS posts_fts_au",
+    "DROP TRIGGER IF EXISTS posts_fts_ad",
+    "DROP TRIGGER IF EXISTS posts_fts_ai",
+    "DROP TABLE IF EXISTS posts_fts",
+]
+
+# A STORED generated column is computed for every existing row on ADD COLUMN,
+# which backfills the index as part of the migration.
+POSTGRES_UPGRADE = POSTS_FTS_POSTGRES_DDL
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_posts_search_vector",
+    "ALTER TABLE posts DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_dialect) -> None:
+    dialect = op.get_bind().dialect.name
+    for statement in statements_by_dialect.get(dialect, []):
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The initial revisions are empty: the tables predate the migrations. This
+    # is the first revision that needs them, so stop with a hint on a fresh database.
+    if not sa.inspect(op.get_bind()).has_table('posts'):
+        raise RuntimeError(
+            "The posts table does not exist. Create a fresh database by starting the app "
+            "once with SCHEMA_MODE=migrate (creates the tables and stamps the head)."
+        )
+    _run({"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _run({"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE})
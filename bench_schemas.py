@@ -0,0 +1,113 @@
+# bench_schemas.py
+"""
+Validation throughput of the request/response schemas, before and after the
+move to native pydantic v2 constructs.
+
+    python bench_schemas.py
+
+"before" are the previous definitions (v1 @validator, class Config), kept
+here for comparison; "after" are the ones in schemas.py/schemas_post.py.
+Also checks that both give the same errors for the same boundary inputs
+and publish the same JSON schema, and exits 1 if they do not.
+"""
+import sys
+import timeit
+import warnings
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, EmailStr, ValidationError
+
+from models import User
+from schemas import UserOut
+from schemas_post import PostCreate
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from pydantic import validator
+
+    class LegacyPostCreate(BaseModel):
+        title: str
+        body: str
+
+        @validator('title')
+        def title_length(cls, v):
+            if len(v) < 3:
+                raise ValueError('Title must be at least 3 characters')
+            if len(v) > 255:
+                raise ValueError('Title must be less than 255 characters')
+            return v
+
+        @validator('body')
+        def body_length(cls, v):
+            if len(v) < 10:
+                raise ValueError('Body must be at least 10 characters')
+            return v
+
+    class LegacyUserOut(BaseModel):
+        id: int
+        email: EmailStr
+        full_name: Optional[str]
+        is_active: bool
+        is_admin: bool
+        created_at: datetime
+        post_count: int = 0
+        last_post_at: Optional[datetime] = None
+
+        class Config:
+            from_attributes = True
+
+
+def _errors(model, data):
+    """(location, type, message) of each error, or None when `data` is accepted"""
+    try:
+        model.model_validate(data)
+        return None
+    except ValidationError as exc:
+        return [(error["loc"], error["type"], error["msg"]) for error in exc.errors()]
+
+
+def _rate(fn, number: int) -> float:
+    fn()  # warm up
+    return number / min(timeit.repeat(fn, number=number, repeat=7))
+
+
+def _bench(label: str, before, after, number: int) -> None:
+    before_rate, after_rate = _rate(before, number), _rate(after, number)
+    print(f"{label:<22} before {before_rate:>10,.0f}/s   after {after_rate:>10,.0f}/s   x{after_rate / before_rate:4.2f}")
+
+
+def main() -> int:
+    boundaries = [
+        {"title": "abc", "body": "0123456789"},
+        {"title": "ab", "body": "0123456789"},
+        {"title": "a" * 255, "body": "0123456789"},
+        {"title": "a" * 256, "body": "0123456789"},
+        {"title": "abc", "body": "012345678"},
+        {"title": "ünï", "body": "日本語日本語日本語日"},
+        {"title": 123, "body": "0123456789"},
+    ]
+    mismatches = [data for data in boundaries if _errors(LegacyPostCreate, data) != _errors(PostCreate, data)]
+    for data in mismatches:
+        print(f"Validated differently: {data!r}")
+    for legacy, current in ((LegacyPostCreate, PostCreate), (LegacyUserOut, UserOut)):
+        # Same document apart from the class name in "title"
+        if {**legacy.model_json_schema(mode="serialization"), "title": current.__name__} != \
+                current.model_json_schema(mode="serialization"):
+            print(f"JSON schema of {current.__name__} differs from the previous definition")
+            mismatches.append(current)
+
+    post = {"title": "A reasonable post title", "body": "Lorem ipsum dolor sit amet. " * 20}
+    user = User(
+        id=1, email="someone@example.com", full_name="Some One", is_active=True, is_admin=False,
+        created_at=datetime(2024, 1, 1), post_count=3, last_post_at=datetime(2024, 2, 1)
+    )
+    _bench("PostCreate (dict)", lambda: LegacyPostCreate.model_validate(post),
+           lambda: PostCreate.model_validate(post), 50000)
+    _bench("UserOut (ORM row)", lambda: LegacyUserOut.model_validate(user),
+           lambda: UserOut.model_validate(user), 5000)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# bench_serialization.py
+"""
+Per-item cost of serializing API responses, FastAPI's default path vs FAST_JSON.
+
+    python bench_serialization.py [items]
+
+"default" is what a response_model endpoint does today: validate every ORM
+row into the schema, dump it to JSON-compatible Python and encode that with
+json.dumps. "fast" builds the schema instances without validation and lets
+pydantic-core write the JSON bytes directly. Each case also checks that both
+paths produce byte-identical bodies, and the script exits 1 if one does not.
+"""
+import asyncio
+import sys
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List, Union
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+import fast_json
+from models import Post, User
+from schemas import UserCursorPage, UserOut, UserPage, UserPageHasMore
+from schemas_post import ExternalPostList, PostOut
+from services_search import _to_external_post
+
+# Strings that stress escaping: quotes, backslashes, control characters, non-ASCII, emoji
+TRICKY = ['plain', 'quote " and \\ backslash', 'tab\tnew\nline\r\x00\x1f\x7f', 'ünïcödé – 日本語', '😀 / </script>']
+# Raw search scores, including the tiny ones bm25 gives common terms (json writes 1e-06, orjson 1e-6)
+SCORES = [12.345678901, 0.5, 1.5e-4, 3.2e-05, 1e-06, 0.0, -2e-07]
+
+
+def _posts(count: int) -> List[Post]:
+    start = datetime(2024, 1, 1, 12, 30, 15, 123456)
+    return [
+        Post(
+            id=i, user_id=i % 50 + 1, title=f"Post {i} {TRICKY[i % len(TRICKY)]}",
+            body=("Lorem ipsum dolor sit amet. " * 20) + TRICKY[i % len(TRICKY)],
+            created_at=start + timedelta(seconds=i)
+        )
+        for i in range(count)
+    ]
+
+
+def _users(count: int) -> List[User]:
+    start = datetime(2024, 1, 1)
+    return [
+        User(
+            id=i, email=f"user{i}@example.com", full_name=TRICKY[i % len(TRICKY)], is_active=i % 7 != 0,
+            is_admin=False, created_at=start + timedelta(minutes=i), post_count=i,
+            last_post_at=None if i % 3 else start + timedelta(days=i)
+        )
+        for i in range(count)
+    ]
+
+
+def _search_page(count: int) -> ExternalPostList:
+    rows = [
+        SimpleNamespace(
+            user_id=i % 50 + 1, id=i, title=f"Post {i}", body=TRICKY[i % len(TRICKY)],
+            score=SCORES[i % len(SCORES)], highlight=f"<mark>Post</mark> {i}"
+        )
+        for i in range(count)
+    ]
+    return ExternalPostList(total=count, page=1, size=count, posts=[_to_external_post(row) for row in rows])
+
+
+def _bench(label: str, default, fast, items: int) -> bool:
+    same = default() == fast()
+    runs = 20
+    default_us = min(timeit.repeat(default, number=runs, repeat=3)) / runs / items * 1e6
+    fast_us = min(timeit.repeat(fast, number=runs, repeat=3)) / runs / items * 1e6
+    print(f"{label:<34} default {default_us:7.2f} us/item   fast {fast_us:7.2f} us/item   "
+          f"x{default_us / fast_us:5.1f}   {'identical' if same else 'BODIES DIFFER'}")
+    return same
+
+
+def main() -> int:
+    if fast_json.orjson is None:
+        print("FAST_JSON needs orjson: pip install orjson")
+        return 1
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    posts, users = _posts(items), _users(items)
+    post_field = create_response_field(name="bench", type_=List[PostOut])
+    user_field = create_response_field(name="bench", type_=List[UserOut])
+    listing_field = create_response_field(name="bench", type_=Union[UserPage, UserPageHasMore, UserCursorPage])
+    post_serializer = fast_json.ModelSerializer(PostOut)
+    user_serializer = fast_json.ModelSerializer(UserOut)
+    listing_serializer = fast_json.ModelSerializer(UserPage)
+
+    def default_posts():
+        return JSONResponse(asyncio.run(serialize_response(field=post_field, response_content=posts))).body
+
+    def default_users():
+        return JSONResponse(asyncio.run(serialize_response(field=user_field, response_content=users))).body
+
+    def listing(instances):
+        return {"total": items, "page": 1, "limit": items, "users": instances, "total_estimated": True}
+
+    def default_listing():
+        content = listing([UserOut.model_validate(user) for user in users])
+        return JSONResponse(asyncio.run(
+            serialize_response(field=listing_field, response_content=content, exclude_unset=True)
+        )).body
+
+    validated = [UserOut.model_validate(user) for user in users]
+    search_page = _search_page(items)
+    ok = all([
+        _bench("List[PostOut] (my-posts)", default_posts, lambda: post_serializer.dump_json(posts), items),
+        _bench("List[UserOut]", default_users, lambda: user_serializer.dump_json(users), items),
+        _bench(
+            "admin listing (UserPage)",
+            default_listing,
+            lambda: listing_serializer.dump_json(
+                listing([user_serializer.construct(u) for u in users]), exclude_unset=True
+            ),
+            items
+        ),
+        # What the response cache stores for the external listing and search results
+        _bench(
+            "search results (cached body)",
+            lambda: JSONResponse(jsonable_encoder(search_page.model_dump(mode="json", exclude_unset=True))).body,
+            lambda: search_page.model_dump_json(exclude_unset=True).encode(),
+            items
+        ),
+        # Dict payloads without a response_model go through jsonable_encoder and the response class
+        _bench(
+            "encoder only (jsonable dict)",
+            lambda: JSONResponse(jsonable_encoder(listing(validated))).body,
+            lambda: fast_json.FastJSONResponse(jsonable_encoder(listing(validated))).body,
+            items
+        ),
+    ])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value`; `ttl` overrides the cache-wide time-to-live for this entry"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class RedisCache:
+    """
+    Optional shared cache tier backed by Redis (needs the `redis` package).
+    Values are strings; any Redis error is treated as a cache miss so the
+    caller falls back to the database instead of failing the request.
+    """
+
+    def __init__(self, url: str, prefix: str, ttl: float = 60.0):
+        import redis.asyncio as redis  # optional dependency, only needed when configured
+
+        self._redis = redis
+        self._client = redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: Hashable) -> Optional[str]:
+        try:
+            value = await self._client.get(self._key(key))
+        except self._redis.RedisError:
+            self.errors += 1
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: str, ttl: Optional[float] = None) -> None:
+        try:
+            await self._client.set(self._key(key), value, px=int((self.ttl if ttl is None else ttl) * 1000))
+        except self._redis.RedisError:
+            self.errors += 1
+
+    async def get_or_set(self, key: Hashable, value: str, ttl: Optional[float] = None) -> Optional[str]:
+        """Current value of `key`, storing `value` first if it has none; None on a Redis error"""
+        try:
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.set(self._key(key), value, px=int((self.ttl if ttl is None else ttl) * 1000), nx=True)
+                pipe.get(self._key(key))
+                _, current = await pipe.execute()
+        except self._redis.RedisError:
+            self.errors += 1
+            return None
+        return current
+
+    async def delete(self, *keys: Hashable) -> None:
+        if not keys:
+            return
+        try:
+            await self._client.delete(*(self._key(key) for key in keys))
+        except self._redis.RedisError:
+            self.errors += 1
+
+    async def publish(self, channel: str, message: str) -> None:
+        try:
+            await self._client.publish(channel, message)
+        except self._redis.RedisError:
+            self.errors += 1
+
+    async def listen(self, channel: str, handler: Callable[[str], Awaitable[None]]) -> None:
+        """Call `handler` for every message on `channel` until cancelled"""
+        pubsub = self._client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    await handler(message["data"])
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
@@ -1,45 +1,43 @@
 # celery_worker.py
+import os
 from celery import Celery
-import time
-from datetime import datetime
+from dotenv import load_dotenv
+from mailer import OutgoingMail, send_batch
+
+load_dotenv()
+
+# Seconds before a batch's transient failures are retried, doubled per retry
+MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", 30))
+MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", 5))
 
 # Create Celery app
 celery_app = Celery(
     'tasks',
-    broker='redis://localhost:6379/0',
-    backend='redis://localhost:6379/0'
+    broker=os.getenv("CELERY_BROKER_URL", 'redis://localhost:6379/0'),
+    backend=os.getenv("CELERY_RESULT_BACKEND", 'redis://localhost:6379/0')
 )
 
-# This is the background task
+@celery_app.task(bind=True, max_retries=MAIL_MAX_RETRIES)
+def send_email_batch(self, mails):
+    """
+    Send a batch of templated emails over one pooled SMTP connection.
+    Only the messages that failed transiently are retried, with backoff;
+    permanent failures are reported and dropped.
+    """
+    sent, retry, failed = send_batch([OutgoingMail.from_dict(mail) for mail in mails])
+    for error in failed:
+        print(f"❌ Email not sent: {error}")
+    if retry:
+        if self.request.retries < self.max_retries:
+            countdown = MAIL_RETRY_BACKOFF * 2 ** self.request.retries
+            print(f"⏳ Retrying {len(retry)} email(s) in {countdown:g}s")
+            raise self.retry(args=([mail.to_dict() for mail in retry],), countdown=countdown)
+        failed += [f"{mail.to}: gave up after {self.max_retries} retries" for mail in retry]
+    return {"sent": sent, "failed": failed}
+
+# Kept for messages queued before the batch pipeline; new code uses the outbox
 @celery_app.task
 def send_welcome_email(email, full_name):
-    """Send welcome email in background (MOCK - just prints)"""
-    
-    print("\n" + "="*60)
-    print("📧 SENDING WELCOME EMAIL (MOCK)")
-    print("="*60)
-    
-    # Simulate sending email (wait 3 seconds)
-    time.sleep(3)
-    
-    # Print mock email
-    print(f"""
-    To: {email}
-    Subject: Welcome to FastAPI!
-    
-    Hi {full_name},
-    
-    Thank you for registering!
-    Your account is now active.
-    
-    Best regards,
-    FastAPI Team
-    
-    Sent at: {datetime.now()}
-    """)
-    
-    print("="*60)
-    print("✅ EMAIL SENT SUCCESSFULLY!")
-    print("="*60 + "\n")
-    
-    return f"Email sent to {email}"
\ No newline at end of file
+    """Queue the welcome email to one user"""
+    send_email_batch.delay([OutgoingMail(email, "welcome", {"full_name": full_name}).to_dict()])
+    return f"Email queued for {email}"
@@ -0,0 +1,153 @@
+# check_import_time.py
+"""
+Cold start check: import time of the app and time to its first request.
+
+    python check_import_time.py
+    IMPORT_TIME_BUDGET_MS=900 python check_import_time.py
+
+Starts a fresh interpreter per run with `python -X importtime`, imports
+main, runs the startup (SCHEMA_MODE=check against a migrated throwaway
+SQLite database) and serves one request. Reports the best of several runs,
+the packages that cost the most to import, and exits 1 if `import main`
+exceeds the budget or a subsystem that should load on first use (Celery,
+passlib, httpx, alembic, ...) was imported before it was needed.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Cumulative `import main`, best of IMPORT_TIME_RUNS; generous for CI machines
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", 1500))
+IMPORT_TIME_RUNS = int(os.getenv("IMPORT_TIME_RUNS", 5))
+
+# Loaded on first use only: none of these may be imported by startup or a plain request
+LAZY_MODULES = ("celery", "kombu", "redis", "passlib", "httpx", "alembic", "aiosmtpd", "jose")
+
+ROOT = Path(__file__).resolve().parent
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+# Runs in the child interpreter; keep its own imports out of the way of `import main`
+_CHILD = """
+import time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import asyncio, json, sys
+
+async def first_request():
+    messages = []
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/v1/posts/external", "raw_path": b"/api/v1/posts/external",
+        "query_string": b"size=1", "root_path": "", "headers": [(b"host", b"cold-start")],
+        "client": ("127.0.0.1", 1), "server": ("cold-start", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        await main.app(scope, receive, send)
+        served = time.perf_counter()
+        loaded = sorted({name.split(".")[0] for name in sys.modules} & set(LAZY))
+    return messages[0]["status"], ready, served, loaded
+
+status, ready, served, loaded = asyncio.run(first_request())
+print(json.dumps({
+    "status": status,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+    "total_ms": (served - started) * 1000,
+    "lazy_loaded": loaded,
+}))
+"""
+
+
+def _environment(database_url: str, schema_mode: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "DATABASE_REPLICA_URLS": "",
+        "CACHE_REDIS_URL": "",
+        "SCHEMA_MODE": schema_mode,
+    })
+    return env
+
+
+def _run_child(env: Dict[str, str], importtime: bool) -> Tuple[dict, str]:
+    args = [sys.executable] + (["-X", "importtime"] if importtime else [])
+    code = f"LAZY = {LAZY_MODULES!r}\n{_CHILD}"
+    proc = subprocess.run(args + ["-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Child interpreter failed:\n{proc.stderr[-4000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def _parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """`import main` cumulative ms and self time per top-level package within it"""
+    entries: List[Tuple[int, int, int, str]] = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match[1]), int(match[2]), len(match[3]), match[4]))
+    # Children are printed before their parent; main's subtree is the run of deeper lines above it
+    index = next(i for i, entry in enumerate(entries) if entry[3] == "main" and entry[2] == 0)
+    packages: Dict[str, float] = defaultdict(float)
+    for self_us, _, depth, name in [entries[index]] + list(reversed(entries[:index])):
+        if name != "main" and depth == 0:
+            break
+        packages[name.split(".")[0]] += self_us / 1000
+    return entries[index][1] / 1000, packages
+
+
+def main() -> int:
+    tmpdir = tempfile.mkdtemp()
+    database_url = f"sqlite+aiosqlite:///{tmpdir}/cold_start.db"
+    # Create and stamp the database once, so timed runs take the production check path
+    _run_child(_environment(database_url, "migrate"), importtime=False)
+    env = _environment(database_url, "check")
+
+    best = None
+    for _ in range(IMPORT_TIME_RUNS):
+        result, stderr = _run_child(env, importtime=True)
+        import_ms, packages = _parse_importtime(stderr)
+        if best is None or import_ms < best[0]:
+            best = (import_ms, packages, result)
+    import_ms, packages, result = best
+
+    print(f"Cold start, best of {IMPORT_TIME_RUNS} (python -X importtime):")
+    print(f"  import main           {import_ms:8.1f} ms   (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)")
+    print(f"  startup (lifespan)    {result['startup_ms']:8.1f} ms")
+    print(f"  first request         {result['first_request_ms']:8.1f} ms   (HTTP {result['status']})")
+    print(f"  total                 {result['total_ms']:8.1f} ms")
+    print("Import time by top-level package (self time within `import main`):")
+    for name, ms in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:12]:
+        print(f"  {name:<22}{ms:8.1f} ms")
+
+    failed = False
+    if result["status"] != 200:
+        print(f"❌ First request returned HTTP {result['status']}")
+        failed = True
+    if result["lazy_loaded"]:
+        print(f"❌ Loaded before first use: {', '.join(result['lazy_loaded'])}")
+        failed = True
+    if import_ms > IMPORT_TIME_BUDGET_MS:
+        print(f"❌ import main took {import_ms:.1f} ms, over the {IMPORT_TIME_BUDGET_MS:.0f} ms budget")
+        failed = True
+    if not failed:
+        print("✅ Within budget, no lazy subsystem loaded at startup")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
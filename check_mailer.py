@@ -0,0 +1,161 @@
+# check_mailer.py
+"""
+End-to-end check of the welcome email pipeline.
+
+Runs the outbox, the send_email_batch task and the SMTP client against a
+local SMTP stand-in (aiosmtpd) and Celery's in-memory broker, so neither
+Redis nor a real mail server is needed:
+
+    python check_mailer.py
+
+Checks batching, template compilation, connection reuse and reconnects,
+retry of transient (4xx) failures, dropping of permanent (5xx) ones and the
+send rate limit. Exits 1 if any check fails.
+"""
+import asyncio
+import os
+import socket
+import sys
+import time
+
+with socket.socket() as _probe:
+    _probe.bind(("127.0.0.1", 0))
+    SMTP_PORT = _probe.getsockname()[1]
+
+# Must be set before the app modules read their settings
+os.environ.update({
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_PORT": str(SMTP_PORT),
+    "SMTP_STARTTLS": "false",
+    "SMTP_USERNAME": "",
+    "MAIL_RATE_LIMIT": "50",
+    "MAIL_RETRY_BACKOFF": "0.1",
+    "MAIL_BATCH_WINDOW": "0.2",
+    "MAIL_BATCH_SIZE": "20",
+    "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+})
+
+from aiosmtpd.controller import Controller
+from celery.contrib.testing.worker import start_worker
+import celery_worker
+import mailer
+from outbox import Outbox
+
+
+class RecordingHandler:
+    """Accepts mail, except recipients told to fail via their address"""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.seen = set()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("reject"):
+            return "550 No such user"
+        if address.startswith("drop") and address not in self.seen:
+            # Shutting down: smtplib closes its side on 421
+            self.seen.add(address)
+            return "421 Closing connection"
+        if address.startswith("later") and address not in self.seen:
+            # Greylisting: fail the first attempt only
+            self.seen.add(address)
+            return "451 Try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos[0], envelope.content.decode()))
+        return "250 Message accepted"
+
+
+async def _wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        await asyncio.sleep(0.05)
+    return condition()
+
+
+async def run(handler: RecordingHandler) -> int:
+    failures = 0
+    controller = Controller(handler, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        nonlocal failures
+        print(f"[{'ok' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+        failures += not ok
+
+    outbox = Outbox()
+
+    # 1. A burst of registrations becomes one task over one connection
+    for i in range(5):
+        outbox.queue(f"user{i}@example.com", "welcome", full_name=f"User {i}")
+    await asyncio.sleep(0)
+    check("emails wait for the batch window", len(handler.messages) == 0)
+    delivered = await _wait_for(lambda: len(handler.messages) == 5)
+    check("burst delivered", delivered, f"{len(handler.messages)}/5 messages")
+    check("one task for the burst", outbox.batches == 1, f"{outbox.batches} task(s)")
+    check("one SMTP connection", handler.connections == 1, f"{handler.connections} connection(s)")
+    check("template rendered", "Hi User 3," in dict(handler.messages)["user3@example.com"])
+    check("template compiled once", mailer._compiled.cache_info().misses == 1,
+          str(mailer._compiled.cache_info()))
+
+    # 2. A full batch is sent before the window closes
+    handler.messages.clear()
+    for i in range(20):
+        outbox.queue(f"full{i}@example.com", "welcome", full_name="Full")
+    check("full batch queued early", await _wait_for(lambda: outbox.batches == 2, timeout=0.15),
+          f"{outbox.batches - 1} task(s) within the window")
+    await _wait_for(lambda: len(handler.messages) == 20)
+
+    # 3. Transient failures are retried, permanent ones dropped
+    handler.messages.clear()
+    outbox.queue("later@example.com", "welcome", full_name="Later")
+    outbox.queue("reject@example.com", "welcome", full_name="Reject")
+    outbox.queue("fine@example.com", "welcome", full_name="Fine")
+    retried = await _wait_for(lambda: "later@example.com" in dict(handler.messages))
+    await asyncio.sleep(0.3)
+    recipients = sorted(to for to, _ in handler.messages)
+    check("4xx retried, 5xx dropped", retried and recipients == ["fine@example.com", "later@example.com"],
+          ", ".join(recipients))
+
+    # 4. A connection the server closes is reopened
+    handler.messages.clear()
+    connections = handler.connections
+    outbox.queue("drop@example.com", "welcome", full_name="Drop")
+    outbox.queue("after-drop@example.com", "welcome", full_name="After")
+    delivered = await _wait_for(lambda: len(handler.messages) == 2)
+    check("reconnect after the server hung up", delivered and handler.connections > connections,
+          f"{len(handler.messages)}/2 messages, {handler.connections - connections} new connection(s)")
+
+    # 5. Sends are rate limited (MAIL_RATE_LIMIT=50/s, 50 burst)
+    handler.messages.clear()
+    started = time.monotonic()
+    for i in range(100):
+        outbox.queue(f"rate{i}@example.com", "welcome", full_name="Rate")
+    await _wait_for(lambda: len(handler.messages) == 100, timeout=20)
+    elapsed = time.monotonic() - started
+    check("rate limited", len(handler.messages) == 100 and elapsed >= 0.9, f"100 emails in {elapsed:.2f}s")
+
+    await outbox.close()
+    mailer.close_connection()
+    controller.stop()
+    print(f"\n{failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    # The in-memory transport polls; the default interval would dominate the timings
+    celery_worker.celery_app.conf.broker_transport_options = {"polling_interval": 0.05}
+    with start_worker(celery_worker.celery_app, perform_ping_check=False):
+        code = asyncio.run(run(RecordingHandler()))
+    sys.exit(code)
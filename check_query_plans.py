@@ -0,0 +1,254 @@
+# check_query_plans.py
+"""
+Query plan regression check.
+
+Drives every API endpoint against a seeded throwaway database, captures
+each SELECT/UPDATE/DELETE the app sends, runs EXPLAIN on it and fails if
+a plan scans a whole table in a statement that is not on the allowlist below.
+
+    python check_query_plans.py            # SQLite temp file
+    PLAN_CHECK_DATABASE_URL=postgresql+asyncpg://... python check_query_plans.py
+
+Exits 1 on regressions, so it can run in CI. On PostgreSQL, sequential scans
+are disabled while explaining: a "Seq Scan" then means no index can serve
+the query at all, not just that the table is small.
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+
+_tmpdir = tempfile.mkdtemp()
+# Must be set before the app modules read their settings
+os.environ["DATABASE_URL"] = os.getenv(
+    "PLAN_CHECK_DATABASE_URL", f"sqlite+aiosqlite:///{_tmpdir}/plans.db"
+)
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+os.environ["SCHEMA_MODE"] = "create_all"
+
+import httpx
+from sqlalchemy import event, insert, update
+import database
+import main
+from models import Post, User
+
+# Column lists follow the models; everything else in an allowed statement must match exactly
+COLUMNS = r"[\w., ]+"
+
+# Whole-table scans that are expected: per dialect and endpoint, the table and the
+# exact statement (whitespace collapsed, placeholders as ?) allowed to scan it.
+# Any other statement scanning a table fails, even on these endpoints.
+ALLOWED_SCANS = {
+    "sqlite": {
+        # Pages in id order walk the rowid b-tree and stop after OFFSET + LIMIT rows,
+        # which SQLite reports as a plain SCAN
+        "GET /api/v1/posts/external": [
+            ("posts", rf"SELECT {COLUMNS} FROM posts ORDER BY posts\.id LIMIT \? OFFSET \?"),
+        ],
+        "GET /api/v1/admin/users": [
+            ("users", rf"SELECT {COLUMNS} FROM users ORDER BY users\.id ASC LIMIT \? OFFSET \?"),
+        ],
+        # Substring search cannot use a b-tree and SQLite has no trigram index
+        "GET /api/v1/admin/users?search": [
+            ("users", rf"SELECT {COLUMNS} FROM users WHERE lower\(users\.email\) LIKE lower\(\?\) "
+                      r"ORDER BY users\.id ASC LIMIT \? OFFSET \?"),
+        ],
+        # Exports and dashboard totals read every row by design
+        "GET /api/v1/posts/export": [("posts", rf"SELECT {COLUMNS} FROM posts ORDER BY posts\.id")],
+        "GET /api/v1/admin/users/export": [("users", rf"SELECT {COLUMNS} FROM users ORDER BY users\.id")],
+        "GET /api/v1/admin/stats": [("users", r"SELECT count\(users\.id\) AS count_1, .+ FROM users")],
+        # Arbitrary LIKE patterns cannot use a b-tree
+        "POST /api/v1/admin/users/bulk-deactivate (filter)": [
+            ("users", r"SELECT count\(\*\) AS count_1 FROM users WHERE lower\(users\.email\) LIKE lower\(\?\) "
+                      r"AND users\.id != \? AND users\.is_active IS NOT 0"),
+            ("users", r"UPDATE users SET is_active=\?, updated_at=\? WHERE lower\(users\.email\) LIKE lower\(\?\) "
+                      r"AND users\.id != \? AND users\.is_active IS NOT 0 RETURNING id"),
+        ],
+    },
+    "postgresql": {
+        "GET /api/v1/posts/export": [("posts", rf"SELECT {COLUMNS} FROM posts ORDER BY posts\.id")],
+        "GET /api/v1/admin/users/export": [("users", rf"SELECT {COLUMNS} FROM users ORDER BY users\.id")],
+        "GET /api/v1/admin/stats": [("users", r"SELECT count\(users\.id\) AS count_1, .+ FROM users")],
+    },
+}
+
+SEED_USERS = 50
+SEED_POSTS_PER_USER = 20
+
+
+def _scanned_tables(dialect: str, plan: str):
+    """Tables read in full according to an EXPLAIN output"""
+    if dialect == "sqlite":
+        # "SCAN posts" is a full scan; "SCAN posts USING INDEX ..." walks an index
+        # in order and "SCAN posts_fts VIRTUAL TABLE INDEX ..." is an FTS lookup
+        tables = set(re.findall(
+            r"\bSCAN (\w+)\b(?! USING (?:COVERING |INTEGER PRIMARY KEY )?INDEX| VIRTUAL TABLE INDEX)", plan
+        ))
+        # The schema table is read when probing for the FTS table, not app data
+        return tables - {"CONSTANT", "sqlite_master", "sqlite_schema"}
+    return set(re.findall(r"Seq Scan on (\w+)", plan))
+
+
+def _normalize(statement: str) -> str:
+    """Statement with whitespace collapsed and every driver's placeholders spelled ?"""
+    statement = " ".join(statement.split())
+    return re.sub(r"\$\d+(?:::[A-Z]+(?: WITH(?:OUT)? TIME ZONE)?)?|%\(\w+\)s|%s", "?", statement)
+
+
+def _unexpected_scans(allowed, dialect: str, label: str, statement: str, plan: str):
+    normalized = _normalize(statement)
+    return {
+        table for table in _scanned_tables(dialect, plan)
+        if not any(table == allowed_table and re.fullmatch(pattern, normalized)
+                   for allowed_table, pattern in allowed.get(label, ()))
+    }
+
+
+class PlanRecorder:
+    def __init__(self):
+        self.label = None
+        self.statements = {}  # (label, statement) -> parameters
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.label is None or executemany:
+            return
+        if not re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", statement, re.IGNORECASE):
+            return
+        self.statements.setdefault((self.label, statement), parameters)
+
+
+async def _explain(statement: str, parameters) -> str:
+    async with database.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.exec_driver_sql("SET enable_seqscan = off")
+            prefix = "EXPLAIN "
+        else:
+            prefix = "EXPLAIN QUERY PLAN "
+        result = await conn.exec_driver_sql(prefix + statement, parameters)
+        rows = result.fetchall()
+        await conn.rollback()
+    return "\n".join(" ".join(str(value) for value in row) for row in rows)
+
+
+async def _seed() -> None:
+    async with database.AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"email": f"seed{i}@example.com", "hashed_password": "x", "full_name": f"Seed {i}"}
+            for i in range(SEED_USERS)
+        ])
+        user_ids = (await db.execute(User.__table__.select().with_only_columns(User.id))).scalars().all()
+        await db.execute(insert(Post), [
+            {"title": f"Post {n} about caching", "body": f"Body text number {n} for user {uid}", "user_id": uid}
+            for uid in user_ids for n in range(SEED_POSTS_PER_USER)
+        ])
+        await db.execute(update(User).values(post_count=SEED_POSTS_PER_USER))
+        await db.commit()
+
+
+async def _exercise(client: httpx.AsyncClient, recorder: PlanRecorder) -> None:
+    async def call(label, method, url, **kwargs):
+        recorder.label = label
+        response = await client.request(method, url, **kwargs)
+        recorder.label = None
+        if response.status_code >= 500:
+            raise RuntimeError(f"{label}: HTTP {response.status_code} {response.text}")
+        return response
+
+    credentials = {"email": "plans@example.com", "password": "secret123"}
+    await call("POST /auth/register", "POST", "/auth/register", json=credentials)
+    login = await call("POST /auth/login", "POST", "/auth/login", json=credentials)
+    auth = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    async with database.AsyncSessionLocal() as db:
+        await db.execute(update(User).where(User.email == credentials["email"]).values(is_admin=True))
+        await db.commit()
+
+    await call("GET /api/v1/profile/me", "GET", "/api/v1/profile/me", headers=auth)
+    await call("GET /api/v1/profile/me (If-None-Match)", "GET", "/api/v1/profile/me",
+               headers={**auth, "If-None-Match": '"stale"'})
+
+    created = await call("POST /api/v1/posts", "POST", "/api/v1/posts",
+                         json={"title": "Plan check", "body": "Checking query plans"}, headers=auth)
+    post_id = created.json()["id"]
+    await call("POST /api/v1/posts/bulk", "POST", "/api/v1/posts/bulk",
+               json=[{"title": "Bulk post", "body": "Bulk body for plans"}] * 3, headers=auth)
+    mine = await call("GET /api/v1/posts/my-posts", "GET", "/api/v1/posts/my-posts",
+                      params={"limit": 2, "total": "true"}, headers=auth)
+    await call("GET /api/v1/posts/my-posts?cursor", "GET", "/api/v1/posts/my-posts",
+               params={"limit": 2, "cursor": mine.headers["X-Next-Cursor"]}, headers=auth)
+    await call("GET /api/v1/posts/my-posts (If-None-Match)", "GET", "/api/v1/posts/my-posts",
+               params={"limit": 2, "total": "true"}, headers={**auth, "If-None-Match": mine.headers["ETag"]})
+    await call("GET /api/v1/posts/external", "GET", "/api/v1/posts/external", params={"page": 3})
+    await call("GET /api/v1/posts/external?search", "GET", "/api/v1/posts/external",
+               params={"search": "caching"})
+    first = await call("GET /api/v1/posts/external?cursor", "GET", "/api/v1/posts/external",
+                       params={"cursor": "", "limit": 10})
+    await call("GET /api/v1/posts/external?cursor", "GET", "/api/v1/posts/external",
+               params={"cursor": first.json()["next_cursor"], "limit": 10})
+    await call("GET /api/v1/posts/external?cursor&search", "GET", "/api/v1/posts/external",
+               params={"cursor": "", "search": "caching"})
+    await call("GET /api/v1/posts/export", "GET", "/api/v1/posts/export", headers=auth)
+    await call("GET /api/v1/posts/{post_id}", "GET", f"/api/v1/posts/{post_id}")
+    await call("GET /api/v1/posts/{post_id} (If-None-Match)", "GET", f"/api/v1/posts/{post_id}",
+               headers={"If-None-Match": '"stale"'})
+
+    await call("GET /api/v1/admin/users", "GET", "/api/v1/admin/users", params={"page": 2}, headers=auth)
+    await call("GET /api/v1/admin/users?search", "GET", "/api/v1/admin/users",
+               params={"search": "seed1"}, headers=auth)
+    await call("GET /api/v1/admin/users?search_mode=prefix", "GET", "/api/v1/admin/users",
+               params={"search": "Seed1", "search_mode": "prefix"}, headers=auth)
+    await call("GET /api/v1/admin/users?active", "GET", "/api/v1/admin/users",
+               params={"active": "false"}, headers=auth)
+    for sort in ("-post_count", "-last_post_at", "created_at"):
+        await call(f"GET /api/v1/admin/users?sort={sort}", "GET", "/api/v1/admin/users",
+                   params={"sort": sort}, headers=auth)
+    await call("GET /api/v1/admin/users?cursor", "GET", "/api/v1/admin/users",
+               params={"cursor": ""}, headers=auth)
+    await call("GET /api/v1/admin/users/export", "GET", "/api/v1/admin/users/export", headers=auth)
+    await call("GET /api/v1/admin/stats", "GET", "/api/v1/admin/stats", headers=auth)
+    await call("POST /api/v1/admin/users/bulk-deactivate (ids)", "POST", "/api/v1/admin/users/bulk-deactivate",
+               json={"ids": [2, 3]}, headers=auth)
+    await call("POST /api/v1/admin/users/bulk-deactivate (filter)", "POST", "/api/v1/admin/users/bulk-deactivate",
+               json={"email_pattern": "%seed4%"}, headers=auth)
+    await call("POST /api/v1/admin/users/bulk-activate (ids)", "POST", "/api/v1/admin/users/bulk-activate",
+               json={"ids": [2, 3]}, headers=auth)
+    await call("POST /api/v1/admin/users/{user_id}/deactivate", "POST", "/api/v1/admin/users/1/deactivate",
+               headers=auth)
+
+
+async def run() -> int:
+    recorder = PlanRecorder()
+    dialect = database.engine.dialect.name
+    allowed = ALLOWED_SCANS.get(dialect, {})
+
+    async with main.lifespan(main.app):
+        await _seed()
+        event.listen(database.engine.sync_engine, "before_cursor_execute", recorder)
+        try:
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+                await _exercise(client, recorder)
+        finally:
+            event.remove(database.engine.sync_engine, "before_cursor_execute", recorder)
+
+        failures = 0
+        for (label, statement), parameters in recorder.statements.items():
+            plan = await _explain(statement, parameters)
+            unexpected = _unexpected_scans(allowed, dialect, label, statement, plan)
+            status = "FULL SCAN " + ", ".join(sorted(unexpected)) if unexpected else "ok"
+            print(f"[{status}] {label}\n    {' '.join(statement.split())[:160]}")
+            if unexpected or os.getenv("PLAN_CHECK_VERBOSE"):
+                print("    " + plan.replace("\n", "\n    "))
+            failures += bool(unexpected)
+
+    print(f"\n{len(recorder.statements)} statements explained on {dialect}, {failures} regression(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    # Celery is not needed to register a user here
+    import celery_worker
+    celery_worker.send_email_batch.delay = lambda *args, **kwargs: None
+    sys.exit(asyncio.run(run()))
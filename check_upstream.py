@@ -0,0 +1,191 @@
+# check_upstream.py
+"""
+Behaviour check of the upstream API client against httpx.MockTransport,
+so no network access is needed:
+
+    python check_upstream.py
+
+Checks retries of 5xx/429 and transport errors, 404 passthrough, the
+stale-while-revalidate cache, coalescing of concurrent misses and the
+circuit breaker's open, half-open (single trial) and close transitions,
+including which outcomes count as failures.
+Exits 1 if any check fails.
+"""
+import asyncio
+import os
+import sys
+
+# Must be set before the app modules read their settings
+os.environ.update({
+    "UPSTREAM_RETRIES": "2",
+    "UPSTREAM_BACKOFF_BASE": "0.01",
+    "UPSTREAM_CACHE_TTL": "0.2",
+    "UPSTREAM_STALE_TTL": "5",
+    "UPSTREAM_BREAKER_THRESHOLD": "2",
+    "UPSTREAM_BREAKER_RESET": "0.3",
+})
+
+import httpx
+from upstream import UPSTREAM_BREAKER_RESET, UPSTREAM_CACHE_TTL, UpstreamClient, UpstreamUnavailable
+
+
+class Script:
+    """Mock upstream: answers each path from a queue of responses, then repeats the last one"""
+
+    def __init__(self, **paths):
+        self.paths = {f"/posts/{name}": list(answers) for name, answers in paths.items()}
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.url.path)
+        answers = self.paths[request.url.path]
+        answer = answers.pop(0) if len(answers) > 1 else answers[0]
+        if isinstance(answer, tuple):  # (delay, answer)
+            await asyncio.sleep(answer[0])
+            answer = answer[1]
+        if isinstance(answer, Exception):
+            raise answer
+        if isinstance(answer, int):
+            return httpx.Response(answer, json={})
+        return httpx.Response(200, json=answer)
+
+    def count(self, name) -> int:
+        return self.requests.count(f"/posts/{name}")
+
+
+def _client(script: Script) -> UpstreamClient:
+    return UpstreamClient("http://upstream.example", transport=httpx.MockTransport(script))
+
+
+async def _fails(call) -> bool:
+    try:
+        await call
+    except UpstreamUnavailable:
+        return True
+    return False
+
+
+async def _open_breaker(client: UpstreamClient, path: str) -> None:
+    # Each exhausted retry loop is one breaker failure; UPSTREAM_BREAKER_THRESHOLD=2
+    for _ in range(2):
+        await _fails(client.get_json(path))
+
+
+async def run() -> int:
+    failures = 0
+
+    def check(name: str, ok: bool, detail: str = "") -> None:
+        nonlocal failures
+        print(f"[{'ok' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+        failures += not ok
+
+    # 1. Retryable statuses and transport errors are retried, then succeed
+    script = Script(
+        retry=[503, 429, {"id": 1}],
+        reset=[httpx.ConnectError("connection refused"), {"id": 2}],
+    )
+    client = _client(script)
+    data = await client.get_json("/posts/retry")
+    check("5xx/429 retried", data == {"id": 1} and script.count("retry") == 3,
+          f"{script.count('retry')} request(s), {client.retries} retries")
+    data = await client.get_json("/posts/reset")
+    check("transport error retried", data == {"id": 2} and script.count("reset") == 2,
+          f"{script.count('reset')} request(s)")
+
+    # 2. Exhausted retries and non-retryable errors fail fast
+    script = Script(down=[503], bad=[400])
+    client = _client(script)
+    check("gives up after the retries", await _fails(client.get_json("/posts/down")) and script.count("down") == 3,
+          f"{script.count('down')} request(s)")
+    check("4xx not retried", await _fails(client.get_json("/posts/bad")) and script.count("bad") == 1,
+          f"{script.count('bad')} request(s)")
+
+    # 3. 404 is passed through as None and cached like any answer
+    script = Script(missing=[404])
+    client = _client(script)
+    first, second = await client.get_json("/posts/missing"), await client.get_json("/posts/missing")
+    check("404 passthrough", first is None and second is None and script.count("missing") == 1,
+          f"{script.count('missing')} request(s)")
+
+    # 4. Stale entries are served at once and refreshed behind the response
+    script = Script(swr=[{"v": 1}, {"v": 2}])
+    client = _client(script)
+    await client.get_json("/posts/swr")
+    await asyncio.sleep(UPSTREAM_CACHE_TTL + 0.05)
+    stale = await client.get_json("/posts/swr")
+    check("stale served while refreshing", stale == {"v": 1} and client.stale_served == 1)
+    await asyncio.sleep(0.05)
+    fresh = await client.get_json("/posts/swr")
+    check("refreshed in the background", fresh == {"v": 2} and script.count("swr") == 2,
+          f"{script.count('swr')} request(s)")
+
+    # 5. Concurrent misses for one path share a request
+    script = Script(popular=[(0.1, {"id": 5})])
+    client = _client(script)
+    results = await asyncio.gather(*(client.get_json("/posts/popular") for _ in range(10)))
+    check("concurrent misses coalesced", all(r == {"id": 5} for r in results) and script.count("popular") == 1,
+          f"{script.count('popular')} request(s) for 10 callers")
+
+    # 6. The breaker opens, rejects without calling upstream, and lets one trial through
+    script = Script(a=[503], b=[503, (0.2, {"id": 7})], c=[{"id": 8}])
+    client = _client(script)
+    await _open_breaker(client, "/posts/a")
+    before = len(script.requests)
+    rejected = await _fails(client.get_json("/posts/c"))
+    check("open breaker rejects", rejected and client.breaker.state == "open" and len(script.requests) == before,
+          client.breaker.state)
+    await asyncio.sleep(UPSTREAM_BREAKER_RESET + 0.05)
+    trial = asyncio.create_task(client.get_json("/posts/b"))
+    await asyncio.sleep(0.05)
+    second = await _fails(client.get_json("/posts/c"))
+    check("half-open admits a single trial", second and script.count("c") == 0, client.breaker.state)
+    check("successful trial closes", await trial == {"id": 7} and client.breaker.state == "closed",
+          client.breaker.state)
+
+    # 7. A failed trial opens the breaker again
+    script = Script(a=[503])
+    client = _client(script)
+    await _open_breaker(client, "/posts/a")
+    await asyncio.sleep(UPSTREAM_BREAKER_RESET + 0.05)
+    await _fails(client.get_json("/posts/a"))
+    check("failed trial reopens", client.breaker.state == "open", client.breaker.state)
+
+    # 8. A request admitted before the breaker opened does not end the trial
+    script = Script(a=[503], slow=[(1.0, {"id": 9})], trial=[(0.3, {"id": 10})], c=[{"id": 11}])
+    client = _client(script)
+    straggler = asyncio.create_task(client.get_json("/posts/slow"))
+    await asyncio.sleep(0.01)
+    await _open_breaker(client, "/posts/a")
+    await asyncio.sleep(UPSTREAM_BREAKER_RESET + 0.05)
+    trial = asyncio.create_task(client.get_json("/posts/trial"))
+    await asyncio.sleep(0.05)
+    straggler.cancel()  # e.g. its client disconnected
+    await asyncio.sleep(0.01)
+    second = await _fails(client.get_json("/posts/c"))
+    check("straggler does not end the trial", second and script.count("c") == 0, client.breaker.state)
+    await trial
+
+    # 9. A request admitted before the breaker opened cannot close it without a trial
+    script = Script(a=[503], slow=[(0.2, {"id": 12})])
+    client = _client(script)
+    straggler = asyncio.create_task(client.get_json("/posts/slow"))
+    await asyncio.sleep(0.01)
+    await _open_breaker(client, "/posts/a")
+    late = await straggler
+    check("late success keeps the breaker open", late == {"id": 12} and client.breaker.state == "open",
+          client.breaker.state)
+
+    # 10. Client errors mean the upstream is up: they never open the breaker
+    script = Script(bad=[400], denied=[403], limited=[429])
+    client = _client(script)
+    for name in ("bad", "denied", "limited", "bad", "denied", "limited"):
+        await _fails(client.get_json(f"/posts/{name}"))
+    check("4xx does not open the breaker", client.breaker.state == "closed" and client.breaker.failures == 0,
+          f"{client.breaker.state}, {client.breaker.failures} failure(s)")
+
+    print(f"\n{failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run()))
@@ -0,0 +1,101 @@
+# counts.py
+import json
+import os
+from typing import Hashable, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from cache import TTLCache
+from models import User
+
+load_dotenv()
+
+# How the admin user listing computes its total
+COUNT_STRATEGY_PATTERN = "^(exact|cached|estimated|none)$"
+
+USER_COUNT_CACHE_SIZE = int(os.getenv("USER_COUNT_CACHE_SIZE", 1024))
+# Upper bound on how stale a cached count can be (invalidation is per worker)
+USER_COUNT_CACHE_TTL = float(os.getenv("USER_COUNT_CACHE_TTL", 60))
+# Estimates under this are replaced by an exact count, which is cheap at that size
+# and avoids nonsense estimates on small or never-analyzed tables
+USER_COUNT_EXACT_BELOW = int(os.getenv("USER_COUNT_EXACT_BELOW", 1000))
+
+_user_counts = TTLCache(maxsize=USER_COUNT_CACHE_SIZE, ttl=USER_COUNT_CACHE_TTL)
+
+# Bumped by every invalidation so a count that raced with one is not cached
+_invalidations = 0
+
+
+async def exact_user_count(db: AsyncSession, filters: Sequence) -> int:
+    result = await db.execute(select(func.count()).select_from(User).where(*filters))
+    return result.scalar_one()
+
+
+class _ExplainJSON(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, compiled with its parameters still bound"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_ExplainJSON, "postgresql")
+def _compile_explain_json(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+async def _estimated_user_count(db: AsyncSession, filters: Sequence) -> Optional[int]:
+    """Row estimate from PostgreSQL planner statistics; None when unavailable"""
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    if not filters:
+        result = await db.execute(text("SELECT reltuples FROM pg_class WHERE oid = 'users'::regclass"))
+        estimate = result.scalar()
+        # -1 (or 0 before PostgreSQL 14) until the table has been analyzed
+        return int(estimate) if estimate and estimate > 0 else None
+
+    # The planner's row estimate for the filtered query, without running it
+    result = await db.execute(_ExplainJSON(select(User.id).where(*filters)))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_users(
+    db: AsyncSession,
+    filters: Sequence,
+    strategy: str,
+    cache_key: Hashable
+) -> Tuple[int, bool]:
+    """
+    Total for the admin user listing as (count, is_estimate).
+    "exact" runs COUNT(*); "cached" reuses an exact count for up to
+    USER_COUNT_CACHE_TTL seconds (dropped early on user insert/deactivate);
+    "estimated" reads planner statistics on PostgreSQL and falls back to an
+    exact count elsewhere or when the estimate is small.
+    """
+    if strategy == "cached":
+        total = _user_counts.get(cache_key)
+        if total is None:
+            generation = _invalidations
+            total = await exact_user_count(db, filters)
+            if generation == _invalidations:
+                _user_counts.set(cache_key, total)
+        return total, False
+
+    if strategy == "estimated":
+        estimate = await _estimated_user_count(db, filters)
+        if estimate is not None and estimate >= USER_COUNT_EXACT_BELOW:
+            return estimate, True
+
+    return await exact_user_count(db, filters), False
+
+
+def invalidate_user_counts() -> None:
+    """Call after users are inserted or (de)activated"""
+    global _invalidations
+    _invalidations += 1
+    _user_counts.clear()
@@ -1,8 +1,14 @@
+from sqlalchemy import and_, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from models import User
-from security import get_password_hash, verify_password
-from typing import Optional
+from hashing import hash_password, check_password
+from singleflight import coalesced_lookup
+from counts import invalidate_user_counts
+from typing import List, Optional, Sequence
+from datetime import datetime
+import string
+import sys
 
 async def create_user(
     db: AsyncSession, 
@@ -11,7 +17,7 @@ async def create_user(
     full_name: Optional[str] = None
 ) -> User:
     """Create a new user"""
-    hashed_password = get_password_hash(password)
+    hashed_password = await hash_password(password)
     user = User(
         email=email,
         hashed_password=hashed_password,
@@ -20,17 +26,132 @@ async def create_user(
     db.add(user)
     await db.commit()
     await db.refresh(user)
+    invalidate_user_counts()
     return user
 
+# SQLite's lower() only folds A-Z; the prefix must be folded the same way to match
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def email_prefix_filter(prefix: str, dialect: str):
+    """
+    Case-insensitive "email starts with" that stays an index range scan on
+    ix_users_email_lower (lower(email)): a LIKE 'prefix%' on PostgreSQL,
+    where that index uses text_pattern_ops, and a plain range on SQLite,
+    which only applies its LIKE optimization to bare columns.
+    """
+    email_lower = func.lower(User.email)
+    if dialect == "postgresql":
+        prefix = prefix.lower()
+        escaped = prefix.replace("/", "//").replace("%", "/%").replace("_", "/_")
+        return email_lower.like(escaped + "%", escape="/")
+    prefix = prefix.translate(_ASCII_LOWER)
+    # Every string starting with `prefix` sorts before prefix with its last character
+    # bumped; trailing U+10FFFF cannot be bumped, and all of them leaves no upper bound
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return email_lower >= prefix
+    bumped = ord(stem[-1]) + 1
+    if 0xD800 <= bumped <= 0xDFFF:
+        bumped = 0xE000  # surrogates are not valid text; the next code point after them
+    upper = stem[:-1] + chr(bumped)
+    return and_(email_lower >= prefix, email_lower < upper)
+
+def user_list_filters(
+    search: Optional[str] = None,
+    active: Optional[bool] = None,
+    search_mode: str = "contains",
+    dialect: str = "sqlite"
+) -> list:
+    """
+    WHERE clauses shared by the admin user listing, its count and the export.
+    `search_mode` is "contains" (substring; a trigram index serves it on
+    PostgreSQL) or "prefix" (email starts with; an index range scan everywhere).
+    """
+    filters = []
+    if search:
+        if search_mode == "prefix":
+            filters.append(email_prefix_filter(search, dialect))
+        else:
+            filters.append(User.email.ilike(f"%{search}%"))
+    if active is not None:
+        filters.append(User.is_active == active)
+    return filters
+
+def user_bulk_filters(
+    ids: Optional[Sequence[int]] = None,
+    email_pattern: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+) -> list:
+    """WHERE clauses selecting the users of a bulk admin operation"""
+    filters = []
+    if ids is not None:
+        filters.append(User.id.in_(ids))
+    if email_pattern:
+        filters.append(User.email.ilike(email_pattern))
+    if created_after is not None:
+        filters.append(User.created_at >= created_after)
+    if created_before is not None:
+        filters.append(User.created_at < created_before)
+    return filters
+
+async def set_users_active(
+    db: AsyncSession,
+    filters: Sequence,
+    active: bool,
+    batch_size: Optional[int] = None,
+    after_id: int = 0
+) -> List[int]:
+    """
+    Set is_active on every matching user whose flag differs, as one
+    UPDATE ... RETURNING id. With `batch_size`, only the next batch in id
+    order after `after_id` is updated (for chunked background runs).
+    Does not commit.
+    """
+    conditions = [*filters, User.is_active.isnot(active)]
+    if batch_size is not None:
+        batch = (
+            select(User.id)
+            .where(*conditions, User.id > after_id)
+            .order_by(User.id)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        conditions = [User.id.in_(batch)]
+    result = await db.execute(
+        update(User)
+        .where(*conditions)
+        .values(is_active=active)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    return sorted(result.scalars().all())
+
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email"""
-    result = await db.execute(select(User).where(User.email == email))
-    return result.scalar_one_or_none()
+    async def load():
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalar_one_or_none()
+
+    return await coalesced_lookup(db, ("user_by_email", email), load)
 
 async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
     """Get user by ID"""
-    result = await db.execute(select(User).where(User.id == user_id))
-    return result.scalar_one_or_none()
+    async def load():
+        result = await db.execute(select(User).where(User.id == user_id))
+        return result.scalar_one_or_none()
+
+    return await coalesced_lookup(db, ("user_by_id", user_id), load)
+
+async def get_user_modified_at(db: AsyncSession, user_id: int) -> Optional[datetime]:
+    """When the user's row last changed, without loading the row"""
+    async def load():
+        result = await db.execute(
+            select(func.coalesce(User.updated_at, User.created_at)).where(User.id == user_id)
+        )
+        return result.scalar_one_or_none()
+
+    return await coalesced_lookup(db, ("user_modified_at", user_id), load)
 
 async def authenticate_user(
     db: AsyncSession, 
@@ -41,6 +162,6 @@ async def authenticate_user(
     user = await get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await check_password(password, user.hashed_password):
         return None
     return user
\ No newline at end of file
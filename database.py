@@ -1,23 +1,317 @@
 # database.py
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from contextvars import ContextVar
+from itertools import count
+from typing import Dict, Hashable, List, Optional
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
+from cache import TTLCache
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./tes.db")
 
+# Engine settings; unset values fall back to the per-backend profile below
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = os.getenv("DB_POOL_SIZE")
+DB_MAX_OVERFLOW = os.getenv("DB_MAX_OVERFLOW")
+DB_POOL_TIMEOUT = os.getenv("DB_POOL_TIMEOUT")
+DB_POOL_RECYCLE = os.getenv("DB_POOL_RECYCLE")
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 500))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,
-    future=True
+# Read replicas (comma-separated URLs); reads go to a healthy replica, writes to DATABASE_URL
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")  # or "least_loaded"
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 5))
+DB_REPLICA_HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", 5))
+# After a user writes, their reads stay on the primary for this long
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", 5))
+
+
+class PoolMetrics:
+    """Checkout wait times for one engine's connection pool"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity  # pool_size + max_overflow
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.metrics.record(time.perf_counter() - started)
+
+
+def _timed_pool_class(metrics: PoolMetrics):
+    # A class attribute survives pool.recreate(), which only copies constructor args
+    return type("TimedQueuePool", (TimedQueuePool,), {"metrics": metrics})
+
+
+def _setting(value: Optional[str], default, cast=int):
+    if value is None:
+        return default
+    if cast is bool:
+        return value.lower() in ("1", "true", "yes")
+    return cast(value)
+
+
+def _sqlite_profile(url) -> dict:
+    if url.database in (None, "", ":memory:"):
+        # In-memory databases live in a single connection; keep the default pool
+        return {}
+    # SQLite allows one writer at a time, so requests share a single kept connection.
+    # A few overflow connections serve code that opens a second session while a
+    # request holds that one (exports, background jobs); WAL lets them read
+    # concurrently and busy_timeout queues their writes instead of failing.
+    return {
+        "pool_size": _setting(DB_POOL_SIZE, 1),
+        "max_overflow": _setting(DB_MAX_OVERFLOW, 4),
+        "pool_timeout": _setting(DB_POOL_TIMEOUT, 30, float),
+        "pool_pre_ping": _setting(DB_POOL_PRE_PING, False, bool),
+    }
+
+
+def _postgresql_profile(url) -> dict:
+    return {
+        "pool_size": _setting(DB_POOL_SIZE, 10),
+        "max_overflow": _setting(DB_MAX_OVERFLOW, 20),
+        "pool_timeout": _setting(DB_POOL_TIMEOUT, 30, float),
+        "pool_recycle": _setting(DB_POOL_RECYCLE, 1800),
+        "pool_pre_ping": _setting(DB_POOL_PRE_PING, True, bool),
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+# Pool metrics per engine name, reported by pool_stats()
+_engines: Dict[str, AsyncEngine] = {}
+_pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def create_engine_from_settings(url: str, name: str = "primary") -> AsyncEngine:
+    """Create an async engine using the pool profile for the URL's backend"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        options = _sqlite_profile(parsed)
+    elif backend == "postgresql":
+        options = _postgresql_profile(parsed)
+        if parsed.get_driver_name() == "asyncpg":
+            # Cache prepared statements per connection (asyncpg dialect option)
+            parsed = parsed.update_query_dict(
+                {"prepared_statement_cache_size": str(DB_STATEMENT_CACHE_SIZE)}
+            )
+    else:
+        options = {}
+
+    metrics = None
+    if "pool_size" in options:
+        metrics = PoolMetrics(options["pool_size"] + max(options["max_overflow"], 0))
+        options["poolclass"] = _timed_pool_class(metrics)
+
+    new_engine = create_async_engine(parsed, echo=DB_ECHO, future=True, **options)
+    if backend == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+    _engines[name] = new_engine
+    if metrics is not None:
+        _pool_metrics[name] = metrics
+    return new_engine
+
+
+def pool_stats() -> Dict[str, dict]:
+    """Pool size, utilization and checkout wait time for every engine"""
+    stats = {}
+    for name, db_engine in _engines.items():
+        pool = db_engine.pool
+        metrics = _pool_metrics.get(name)
+        if metrics is None:
+            stats[name] = {"pool": type(pool).__name__}
+            continue
+        capacity = metrics.capacity
+        stats[name] = {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "utilization": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+            "checkouts": metrics.checkouts,
+            "avg_wait_ms": round(metrics.wait_seconds_total / metrics.checkouts * 1000, 3) if metrics.checkouts else 0.0,
+            "max_wait_ms": round(metrics.wait_seconds_max * 1000, 3),
+        }
+    return stats
+
+
+engine = create_engine_from_settings(DATABASE_URL)
+
+
+# ----------------- READ REPLICAS -----------------
+# Replication lag in seconds; 0 when the standby has replayed everything it received
+_POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaSet:
+    """Read replica engines with health checks and lag-based eviction"""
+
+    def __init__(self, engines: Dict[str, AsyncEngine], strategy: str, max_lag: float):
+        if strategy not in ("round_robin", "least_loaded"):
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.engines = engines
+        self.strategy = strategy
+        self.max_lag = max_lag
+        # Replicas start healthy; the health check evicts and restores them
+        self.healthy: List[str] = list(engines)
+        self.lag: Dict[str, Optional[float]] = {name: None for name in engines}
+        self.errors: Dict[str, Optional[str]] = {name: None for name in engines}
+        self._counter = count()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Pick a healthy replica, or None to fall back to the primary"""
+        healthy = self.healthy
+        if not healthy:
+            return None
+        if self.strategy == "least_loaded":
+            name = min(healthy, key=lambda n: getattr(self.engines[n].pool, "checkedout", lambda: 0)())
+        else:
+            name = healthy[next(self._counter) % len(healthy)]
+        return self.engines[name]
+
+    async def _check(self, name: str) -> None:
+        replica = self.engines[name]
+        try:
+            async with replica.connect() as conn:
+                if replica.dialect.name == "postgresql":
+                    lag = float((await conn.execute(_POSTGRES_LAG_QUERY)).scalar_one())
+                else:
+                    await conn.execute(text("SELECT 1"))
+                    lag = 0.0
+            self.lag[name], self.errors[name] = lag, None
+        except Exception as exc:
+            self.lag[name], self.errors[name] = None, repr(exc)
+
+    async def check_health(self) -> None:
+        """Probe every replica; evict unreachable ones and those lagging past max_lag"""
+        await asyncio.gather(*(self._check(name) for name in self.engines))
+        self.healthy = [
+            name for name in self.engines
+            if self.lag[name] is not None and self.lag[name] <= self.max_lag
+        ]
+
+    async def _run_health_checks(self, interval: float) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(interval)
+
+    def start_health_checks(self) -> Optional[asyncio.Task]:
+        if not self.engines:
+            return None
+        return asyncio.create_task(self._run_health_checks(DB_REPLICA_HEALTH_INTERVAL))
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            name: {
+                "healthy": name in self.healthy,
+                "lag_seconds": self.lag[name],
+                "error": self.errors[name]
+            }
+            for name in self.engines
+        }
+
+
+replicas = ReplicaSet(
+    {f"replica{i}": create_engine_from_settings(url, name=f"replica{i}")
+     for i, url in enumerate(DATABASE_REPLICA_URLS, start=1)},
+    DB_REPLICA_STRATEGY,
+    DB_REPLICA_MAX_LAG
 )
 
+# Who the current request writes as (set by the auth dependency), for read-your-own-writes
+_write_scope: ContextVar[Optional[Hashable]] = ContextVar("db_write_scope", default=None)
+_recent_writers = TTLCache(maxsize=100000, ttl=DB_READ_YOUR_WRITES_SECONDS)
+
+
+def set_write_scope(scope: Hashable) -> None:
+    """Tie this request's reads and writes to `scope` (e.g. the user id)"""
+    _write_scope.set(scope)
+
+
+class RoutingSession(Session):
+    """
+    Sends writes, flushes and everything after them to the primary, and
+    other reads to a replica. Statements can force the primary with
+    .execution_options(use_primary=True).
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self._mark_write()
+            return engine.sync_engine
+        if not replicas:
+            return engine.sync_engine
+        if self.info.get("wrote"):
+            return engine.sync_engine
+        if clause is not None and clause.get_execution_options().get("use_primary"):
+            return engine.sync_engine
+        scope = _write_scope.get()
+        if scope is not None and _recent_writers.get(scope) is not None:
+            return engine.sync_engine
+        replica = replicas.choose()
+        return (replica or engine).sync_engine
+
+    def _mark_write(self) -> None:
+        self.info["wrote"] = True
+        scope = _write_scope.get()
+        if scope is not None:
+            _recent_writers.set(scope, True)
+
+
+def has_recent_writes(session: AsyncSession) -> bool:
+    """True when `session`, or the writer of the current request, wrote recently"""
+    if session.sync_session.info.get("wrote"):
+        return True
+    scope = _write_scope.get()
+    return scope is not None and _recent_writers.get(scope) is not None
+
+
 AsyncSessionLocal = async_sessionmaker(
-    bind=engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False
 )
 
@@ -0,0 +1,204 @@
+# db_schema.py
+import ast
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+load_dotenv()
+
+# What startup does about the database schema:
+#   check      - compare alembic_version with the migration head, refuse to start if they differ
+#   migrate    - same, but run `alembic upgrade head` (one process at a time) instead of refusing
+#   create_all - create missing tables from the models, no version check (dev/tests only)
+SCHEMA_MODE = os.getenv("SCHEMA_MODE", "check")
+# How long a process waits for another one's migration before giving up
+SCHEMA_MIGRATE_LOCK_TIMEOUT = float(os.getenv("SCHEMA_MIGRATE_LOCK_TIMEOUT", 300))
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+# script_location in alembic.ini
+MIGRATIONS_DIR = ALEMBIC_INI.parent / "alembic" / "versions"
+# Arbitrary but fixed: every worker contends on the same advisory lock
+_POSTGRES_LOCK_KEY = 0x5C4E3A
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is not at the migration head and SCHEMA_MODE does not allow fixing it"""
+
+
+def _alembic_config():
+    from alembic.config import Config
+    return Config(str(ALEMBIC_INI))
+
+
+def _script_revisions(path: Path) -> dict:
+    """`revision` and `down_revision` of one migration script, read without running it"""
+    values = {}
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target, value = node.targets[0], node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            target, value = node.target, node.value
+        else:
+            continue
+        if isinstance(target, ast.Name) and target.id in ("revision", "down_revision"):
+            values[target.id] = ast.literal_eval(value)
+    return values
+
+
+def migration_heads() -> Set[str]:
+    """
+    Head revision(s) of the migration scripts on disk; no database access.
+    Parsed from the scripts directly: going through alembic's ScriptDirectory
+    imports alembic and executes every script, which is most of the startup
+    check's cost in check mode.
+    """
+    revisions, parents = set(), set()
+    for path in MIGRATIONS_DIR.glob("*.py"):
+        values = _script_revisions(path)
+        if "revision" not in values:
+            continue
+        revisions.add(values["revision"])
+        down_revision = values.get("down_revision")
+        if isinstance(down_revision, str):
+            parents.add(down_revision)
+        elif down_revision:
+            parents.update(down_revision)  # merge revision
+    return revisions - parents
+
+
+async def database_revisions(engine: AsyncEngine) -> Optional[Set[str]]:
+    """Revisions stamped in alembic_version, in one query; None when the table is missing"""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            return {row[0] for row in result}
+    except DBAPIError as exc:
+        if "alembic_version" not in str(exc.orig):
+            raise  # unreachable database etc., not a missing table
+        return None
+
+
+async def _has_app_tables(engine: AsyncEngine) -> bool:
+    async with engine.connect() as conn:
+        return await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users"))
+
+
+async def _create_all(engine: AsyncEngine) -> None:
+    from database import Base
+    import models  # noqa: F401 (registers the tables)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def _run_alembic(command_name: str) -> None:
+    from alembic import command
+    # env.py runs its own event loop, so this must not be called on ours
+    getattr(command, command_name)(_alembic_config(), "head")
+
+
+async def _migrate(engine: AsyncEngine, heads: Set[str]) -> None:
+    """Bring the database to the head; re-checked under the lock, so only one process migrates"""
+    revisions = await database_revisions(engine)
+    if revisions == heads:
+        print(f"✅ Database schema is at revision {', '.join(sorted(heads))} (migrated by another process)")
+        return
+    if revisions is None:
+        if await _has_app_tables(engine):
+            raise SchemaOutOfDate(
+                "Database has tables but no alembic_version. Run `alembic stamp <revision>` "
+                "with the revision it matches, then restart."
+            )
+        # Fresh database: the early migrations assume existing tables, so build from the models
+        await _create_all(engine)
+        await asyncio.to_thread(_run_alembic, "stamp")
+        print(f"✅ Database created at revision {', '.join(sorted(heads))}")
+        return
+    await asyncio.to_thread(_run_alembic, "upgrade")
+    print(f"✅ Database migrated from {', '.join(sorted(revisions))} to {', '.join(sorted(heads))}")
+
+
+async def _migrate_with_postgres_lock(engine: AsyncEngine, heads: Set[str]) -> None:
+    async with engine.connect() as conn:
+        # Poll instead of a blocking lock with lock_timeout, which would stay set on the pooled connection
+        deadline = time.monotonic() + SCHEMA_MIGRATE_LOCK_TIMEOUT
+        while True:
+            result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _POSTGRES_LOCK_KEY})
+            locked = result.scalar()
+            # The lock is held by the session; do not sit idle in a transaction while waiting or migrating
+            await conn.commit()
+            if locked:
+                break
+            if time.monotonic() > deadline:
+                raise SchemaOutOfDate("Timed out waiting for another process to finish migrating")
+            await asyncio.sleep(0.5)
+        try:
+            await _migrate(engine, heads)
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _POSTGRES_LOCK_KEY})
+            await conn.commit()
+
+
+def _try_lock_file(fd: int) -> bool:
+    """Non-blocking exclusive lock on `fd`; the OS drops it when the process dies"""
+    try:
+        if os.name == "nt":
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+async def _migrate_with_file_lock(engine: AsyncEngine, heads: Set[str]) -> None:
+    # SQLite and others: an OS lock on a file next to alembic.ini (same host only).
+    # The file itself stays; a killed process leaves it unlocked, never stale.
+    lock_path = ALEMBIC_INI.with_name(".schema-migrate.lock")
+    fd = os.open(str(lock_path), os.O_CREAT | os.O_RDWR)
+    try:
+        deadline = time.monotonic() + SCHEMA_MIGRATE_LOCK_TIMEOUT
+        while not _try_lock_file(fd):
+            if time.monotonic() > deadline:
+                raise SchemaOutOfDate(f"Timed out waiting for the migration lock on {lock_path}")
+            await asyncio.sleep(0.5)
+        await _migrate(engine, heads)
+    finally:
+        os.close(fd)  # closing releases the lock
+
+
+async def ensure_schema(engine: AsyncEngine, mode: str = SCHEMA_MODE) -> None:
+    """Startup schema check; see SCHEMA_MODE"""
+    if mode == "create_all":
+        await _create_all(engine)
+        print("✅ Database tables created!")
+        return
+    if mode not in ("check", "migrate"):
+        raise ValueError(f"Unknown SCHEMA_MODE: {mode}")
+
+    heads = migration_heads()
+    revisions = await database_revisions(engine)
+    if revisions == heads:
+        print(f"✅ Database schema is at revision {', '.join(sorted(heads))}")
+        return
+    if mode == "check":
+        if revisions is None:
+            raise SchemaOutOfDate(
+                "Database has no alembic_version table. Start once with SCHEMA_MODE=migrate "
+                "to create a fresh database, or `alembic stamp` an existing one."
+            )
+        raise SchemaOutOfDate(
+            f"Database schema is at {', '.join(sorted(revisions))}, expected {', '.join(sorted(heads))}. "
+            "Run `alembic upgrade head`, or start with SCHEMA_MODE=migrate."
+        )
+    if engine.dialect.name == "postgresql":
+        await _migrate_with_postgres_lock(engine, heads)
+    else:
+        await _migrate_with_file_lock(engine, heads)
@@ -1,18 +1,17 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db
-from models import User
+from database import get_db, set_write_scope
+from principals import Principal, load_principal
 from security import decode_token
-from sqlalchemy.future import select
 
 security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-) -> User:
-    """Get the current logged-in user from JWT token"""
+) -> Principal:
+    """Get the current logged-in user from JWT token (served from the principal cache)"""
     token = credentials.credentials
     user_id = decode_token(token)
     
@@ -23,8 +22,7 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await load_principal(db, user_id)
     
     if user is None:
         raise HTTPException(
@@ -38,12 +36,14 @@ async def get_current_user(
             detail="User account is deactivated"
         )
     
+    # Reads right after this user's own writes go to the primary
+    set_write_scope(("user", user.id))
     return user
 
 
 async def get_current_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_user)
+) -> Principal:
     """Check if current user is an admin"""
     if not current_user.is_admin:
         raise HTTPException(
@@ -0,0 +1,103 @@
+# fast_json.py
+import os
+from typing import Any, Dict, List, Optional, Type
+from dotenv import load_dotenv
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+load_dotenv()
+
+# Opt-in: encode responses with orjson and serialize trusted DB rows without re-validating them
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() == "true"
+
+try:
+    import orjson
+except ImportError:  # optional dependency, only needed with FAST_JSON=true
+    orjson = None
+
+if FAST_JSON and orjson is None:
+    raise RuntimeError("FAST_JSON=true needs orjson: pip install orjson")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson. Byte-identical to the stdlib encoder for
+    this app's payloads: compact separators and raw UTF-8 like JSONResponse;
+    only floats below 1e-4 or from 1e16 up would be spelled differently
+    (1e-5 vs 1e-05), so every float the API returns is rounded to at most
+    4 decimals (search ranks: services_search.RANK_DECIMALS).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ModelSerializer:
+    """JSON encoder for one response schema, built once and reused for every response"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._one = TypeAdapter(model)
+        self._many = TypeAdapter(List[model])
+
+    def construct(self, row: Any) -> BaseModel:
+        """Schema instance from a trusted ORM row, skipping validation"""
+        if isinstance(row, self.model):
+            return row
+        if isinstance(row, dict):
+            # A page assembled by the endpoint; its nested schemas are already built
+            return self.model.model_construct(**row)
+        return self.model.model_construct(**{name: getattr(row, name) for name in self.fields})
+
+    def dump_json(self, content: Any, exclude_unset: bool = False) -> bytes:
+        if isinstance(content, (list, tuple)):
+            return self._many.dump_json([self.construct(row) for row in content], exclude_unset=exclude_unset)
+        return self._one.dump_json(self.construct(content), exclude_unset=exclude_unset)
+
+
+_serializers: Dict[Type[BaseModel], ModelSerializer] = {}
+
+
+def serializer_for(model: Type[BaseModel]) -> ModelSerializer:
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = ModelSerializer(model)
+    return serializer
+
+
+def model_response(
+    model: Type[BaseModel],
+    content: Any,
+    response: Optional[Response] = None,
+    status_code: int = 200,
+    exclude_unset: bool = False
+) -> Any:
+    """
+    Return value for an endpoint whose response_model is `model` (or a list
+    of it) and whose `content` comes straight from the database, or is a dict
+    of `model`'s fields wrapping schema instances from model_instances().
+    With FAST_JSON the rows are encoded to JSON in one pass by pydantic-core,
+    keeping headers set on `response`; otherwise `content` is returned
+    unchanged for FastAPI's validate-then-encode path. Pass the endpoint's
+    response_model_exclude_unset as `exclude_unset`.
+    """
+    if not FAST_JSON:
+        return content
+    body = serializer_for(model).dump_json(content, exclude_unset=exclude_unset)
+    fast = Response(body, status_code=status_code, media_type="application/json")
+    if response is not None:
+        fast.raw_headers.extend(
+            (name, value) for name, value in response.raw_headers
+            if name not in (b"content-length", b"content-type")
+        )
+    return fast
+
+
+def model_instances(model: Type[BaseModel], rows: List[Any]) -> List[BaseModel]:
+    """Schema instances for trusted DB rows; validated unless FAST_JSON is on"""
+    if FAST_JSON:
+        serializer = serializer_for(model)
+        return [serializer.construct(row) for row in rows]
+    return [model.model_validate(row) for row in rows]
@@ -0,0 +1,102 @@
+# hashing.py
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from security import get_password_hash, verify_password
+
+load_dotenv()
+
+# "thread" keeps bcrypt off the event loop; "process" also isolates its CPU from the worker
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+# Calls queued or running beyond this are rejected with 503 (0 = unbounded)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+
+
+class HashingBusyError(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+class PasswordHasher:
+    """Runs bcrypt hash/verify on a dedicated, bounded executor"""
+
+    def __init__(self, kind: str = "thread", workers: int = 2, max_pending: int = 32):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.max_pending and self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingBusyError("Password hashing queue is full")
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            # Latency includes the time spent waiting in the queue
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.completed += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": round(self._total_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_latency_ms": round(self._max_seconds * 1000, 2)
+        }
+
+
+password_hasher = PasswordHasher(
+    PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password without blocking the event loop"""
+    return await password_hasher.hash(password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop"""
+    return await password_hasher.verify(plain_password, hashed_password)
@@ -0,0 +1,98 @@
+# jobs.py
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Finished jobs kept for status polling; the oldest are dropped first
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", 100))
+
+
+@dataclass
+class Job:
+    """An admin operation running in this worker's event loop"""
+    id: str
+    kind: str
+    status: str = "running"  # running | done | failed | cancelled
+    processed: int = 0
+    result: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "processed": self.processed,
+            "result": self.result,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    """
+    In-process background jobs with pollable status.
+    Jobs live in the worker that started them: with several workers, poll
+    the status on the same one (or use Celery for durable work).
+    """
+
+    def __init__(self, history_size: int = JOB_HISTORY_SIZE):
+        self.history_size = history_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, kind: str, run: Callable[[Job], Awaitable[None]]) -> Job:
+        """Run `run(job)` in the background; it reports progress on the job"""
+        job = Job(id=uuid.uuid4().hex, kind=kind)
+        self._jobs[job.id] = job
+        self._prune()
+
+        async def wrapper() -> None:
+            try:
+                await run(job)
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                raise
+            except Exception as exc:
+                job.status, job.error = "failed", repr(exc)
+            finally:
+                job.finished_at = time.time()
+                self._tasks.pop(job.id, None)
+
+        self._tasks[job.id] = asyncio.create_task(wrapper())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status != "running"]
+        for job_id in finished[:max(len(self._jobs) - self.history_size, 0)]:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs; work already committed by them stays"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+
+jobs = JobRegistry()
@@ -0,0 +1,218 @@
+# mailer.py
+import os
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from functools import lru_cache
+from string import Template
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Without SMTP_HOST messages are printed instead of sent (development)
+SMTP_HOST = os.getenv("SMTP_HOST")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))
+# Reconnect instead of reusing a connection idle for longer (servers drop idle clients)
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))
+MAIL_FROM = os.getenv("MAIL_FROM", "FastAPI Team <no-reply@example.com>")
+# Messages per second per worker process; 0 disables the limit
+MAIL_RATE_LIMIT = float(os.getenv("MAIL_RATE_LIMIT", 10))
+# Immediate reconnect-and-resend attempts per message before it is handed back for a later retry
+MAIL_SEND_ATTEMPTS = int(os.getenv("MAIL_SEND_ATTEMPTS", 2))
+
+
+# name -> (version, subject, body). Bump the version when editing a template
+TEMPLATES: Dict[str, Tuple[int, str, str]] = {
+    "welcome": (
+        1,
+        "Welcome to FastAPI!",
+        "Hi $full_name,\n\n"
+        "Thank you for registering!\n"
+        "Your account is now active.\n\n"
+        "Best regards,\n"
+        "FastAPI Team\n",
+    ),
+}
+
+
+class TransientMailError(Exception):
+    """Sending failed in a way that may succeed later (connection, 4xx reply)"""
+
+
+@dataclass
+class OutgoingMail:
+    to: str
+    template: str
+    context: Dict[str, Any]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OutgoingMail":
+        return cls(data["to"], data["template"], data.get("context") or {})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"to": self.to, "template": self.template, "context": self.context}
+
+
+@lru_cache(maxsize=None)
+def _compiled(name: str, version: int) -> Tuple[Template, Template]:
+    """Parse a template once per version, not once per message"""
+    _, subject, body = TEMPLATES[name]
+    return Template(subject), Template(body)
+
+
+def render(mail: OutgoingMail) -> EmailMessage:
+    version = TEMPLATES[mail.template][0]
+    subject, body = _compiled(mail.template, version)
+    message = EmailMessage()
+    message["From"] = MAIL_FROM
+    message["To"] = mail.to
+    message["Subject"] = subject.safe_substitute(mail.context)
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    message.set_content(body.safe_substitute(mail.context))
+    return message
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` sends per second, bursts up to one second's worth"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = max(rate, 1.0)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class SMTPConnection:
+    """
+    One persistent SMTP session per worker process, reused across batches
+    and reopened when the server dropped it or it sat idle too long.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.sent = 0
+
+    def _open(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USERNAME:
+            smtp.login(SMTP_USERNAME, SMTP_PASSWORD or "")
+        self.connects += 1
+        return smtp
+
+    def _close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+
+    def send(self, message: EmailMessage) -> None:
+        with self._lock:
+            for attempt in range(MAIL_SEND_ATTEMPTS):
+                if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+                    self._close()
+                try:
+                    if self._smtp is None:
+                        self._smtp = self._open()
+                    self._smtp.send_message(message)
+                except smtplib.SMTPResponseException as exc:
+                    if 400 <= exc.smtp_code < 500:
+                        raise TransientMailError(f"{exc.smtp_code} {exc.smtp_error!r}") from exc
+                    raise
+                except smtplib.SMTPRecipientsRefused as exc:
+                    # One recipient per message: greylisting and full mailboxes reply 4xx
+                    codes = [code for code, _ in exc.recipients.values()]
+                    if codes and all(400 <= code < 500 for code in codes):
+                        raise TransientMailError(repr(exc)) from exc
+                    raise
+                except OSError as exc:  # also SMTPServerDisconnected and socket errors
+                    # Dropped or stale connection: reconnect and resend
+                    self._close()
+                    if attempt + 1 == MAIL_SEND_ATTEMPTS:
+                        raise TransientMailError(repr(exc)) from exc
+                    continue
+                self._last_used = time.monotonic()
+                self.sent += 1
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+class ConsoleConnection:
+    """Prints messages instead of sending them (no SMTP_HOST configured)"""
+
+    sent = 0
+
+    def send(self, message: EmailMessage) -> None:
+        print("\n" + "=" * 60)
+        print(f"📧 EMAIL (console)\nTo: {message['To']}\nSubject: {message['Subject']}\n")
+        print(message.get_content())
+        print("=" * 60 + "\n")
+        self.sent += 1
+
+    def close(self) -> None:
+        pass
+
+
+_connection = SMTPConnection(SMTP_HOST, SMTP_PORT) if SMTP_HOST else ConsoleConnection()
+_limiter = RateLimiter(MAIL_RATE_LIMIT)
+
+
+def send_batch(mails: List[OutgoingMail]) -> Tuple[int, List[OutgoingMail], List[str]]:
+    """
+    Send every mail over the shared connection, rate limited.
+    Returns (sent, mails to retry later, permanent failures).
+    """
+    sent, retry, failed = 0, [], []
+    for mail in mails:
+        try:
+            message = render(mail)
+        except (KeyError, ValueError) as exc:
+            failed.append(f"{mail.to}: cannot render {mail.template!r}: {exc!r}")
+            continue
+        _limiter.acquire()
+        try:
+            _connection.send(message)
+        except TransientMailError:
+            retry.append(mail)
+        except smtplib.SMTPException as exc:
+            # 5xx: bad recipient, rejected content, ... retrying will not help
+            failed.append(f"{mail.to}: {exc!r}")
+        else:
+            sent += 1
+    return sent, retry, failed
+
+
+def close_connection() -> None:
+    _connection.close()
@@ -1,30 +1,64 @@
 # main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from database import engine, Base
+from fast_json import FAST_JSON, FastJSONResponse
+from database import engine, replicas
+from db_schema import ensure_schema
+from hashing import HashingBusyError, password_hasher
+from jobs import jobs
+from outbox import outbox
+from principals import start_invalidation_listener
+from upstream import UpstreamUnavailable, upstream
 from routers import auth, profile, posts, admin
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Starting up...")
 
-    # Import models to register them with Base
-    import models
+    # One query against alembic_version instead of reflecting every table (see SCHEMA_MODE)
+    await ensure_schema(engine)
 
-    # Create all tables in PostgreSQL
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    print("✅ Database tables created!")
+    # Drop principals invalidated by other workers (only with CACHE_REDIS_URL)
+    invalidation_listener = start_invalidation_listener()
+    # Probe read replicas and evict unhealthy/lagging ones (only with DATABASE_REPLICA_URLS)
+    replica_health_checks = replicas.start_health_checks()
+    # The pooled upstream client starts with the first upstream request, not here
     yield
+    for task in (invalidation_listener, replica_health_checks):
+        if task is not None:
+            task.cancel()
+    await jobs.shutdown()
+    await outbox.close()
+    await upstream.close()
+    password_hasher.shutdown()
     print("👋 Shutting down...")
 
 app = FastAPI(
     title="FastAPI JWT Project",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse if FAST_JSON else JSONResponse
 )
 
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    # Back-pressure: shed login/register bursts instead of queueing without bound
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable_handler(request: Request, exc: UpstreamUnavailable):
+    # Fail fast while the upstream API is down instead of tying up workers on it
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Upstream service unavailable"},
+        headers={"Retry-After": str(max(int(exc.retry_after), 1))}
+    )
+
 # Include your routers
 app.include_router(auth.router)
 app.include_router(profile.router)
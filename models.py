@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, DDL, ForeignKey, Index, event, func
 from datetime import datetime
 from database import Base  # Import Base from database.py
 
@@ -13,6 +13,27 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Denormalized activity, kept in step with posts in the same transaction
+    post_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_post_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Keyset (cursor) pagination order
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Admin listing sorted by activity
+        Index("ix_users_post_count", "post_count"),
+        Index("ix_users_last_post_at", "last_post_at"),
+        # Admin listing filtered by active/inactive, in id order
+        Index("ix_users_is_active_id", "is_active", "id"),
+        # Case-insensitive email prefix search as an index range scan
+        # (text_pattern_ops lets PostgreSQL use it for LIKE 'prefix%' in any collation)
+        Index(
+            "ix_users_email_lower",
+            func.lower(email).label("email_lower"),
+            postgresql_ops={"email_lower": "text_pattern_ops"}
+        ),
+    )
 
 class Post(Base):
     __tablename__ = "posts"
@@ -20,6 +41,65 @@ class Post(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     body = Column(Text, nullable=False)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Keyset (cursor) pagination order
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        # A user's posts, newest first (also serves every lookup by user_id)
+        Index("ix_posts_user_id_created_at_id", user_id, created_at.desc(), id.desc()),
+    )
+
+
+# PostgreSQL: trigram index so the admin email ILIKE '%...%' search can use an index.
+# Keep in sync with the add_composite_indexes migration.
+USERS_EMAIL_TRGM_POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+]
+
+for _statement in USERS_EMAIL_TRGM_POSTGRES_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+# ----------------- FULL-TEXT SEARCH -----------------
+# The search index lives outside the mapped columns so the ORM never loads it.
+# The add_post_full_text_search migration runs these same statements on existing databases.
+
+# SQLite: external-content FTS5 table kept in sync with posts by triggers
+POSTS_FTS_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE posts_fts USING fts5("
+    "title, body, content='posts', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts(rowid, title, body) VALUES (new.id, new.title, new.body); "
+    "END",
+    "CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "END",
+    "CREATE TRIGGER posts_fts_au AFTER UPDATE OF title, body ON posts BEGIN "
+    "INSERT INTO posts_fts(posts_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO posts_fts(rowid, title, body) VALUES (new.id, new.title, new.body); "
+    "END",
+]
+
+# PostgreSQL: generated tsvector column (title weighted above body) with a GIN index
+POSTS_FTS_POSTGRES_DDL = [
+    "ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX ix_posts_search_vector ON posts USING gin (search_vector)",
+]
+
+for _statement in POSTS_FTS_SQLITE_DDL:
+    event.listen(Post.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTS_FTS_POSTGRES_DDL:
+    event.listen(Post.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+event.listen(
+    Post.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS posts_fts").execute_if(dialect="sqlite")
+)
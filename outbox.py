@@ -0,0 +1,84 @@
+# outbox.py
+import asyncio
+import os
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from mailer import OutgoingMail
+
+load_dotenv()
+
+# Emails queued within this many seconds go to the worker as one task
+MAIL_BATCH_WINDOW = float(os.getenv("MAIL_BATCH_WINDOW", 2))
+# ... unless this many are waiting, which flushes the batch right away
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 100))
+
+
+class Outbox:
+    """
+    Collects outgoing emails in the API process and enqueues them as
+    send_email_batch tasks, one per time window, instead of one task per email.
+    Unflushed emails are lost if the process dies, as queued tasks would be
+    if the broker did.
+    """
+
+    def __init__(self, window: float = MAIL_BATCH_WINDOW, batch_size: int = MAIL_BATCH_SIZE):
+        self.window = window
+        self.batch_size = batch_size
+        self._pending: List[OutgoingMail] = []
+        self._full = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self.queued = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def queue(self, to: str, template: str, **context) -> None:
+        """Add an email to the current batch (sent within `window` seconds)"""
+        self._pending.append(OutgoingMail(to, template, context))
+        self.queued += 1
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self) -> None:
+        try:
+            await asyncio.wait_for(self._full.wait(), self.window)
+        except asyncio.TimeoutError:
+            pass
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Enqueue everything pending now, in tasks of at most `batch_size` emails"""
+        # Celery (and kombu) load on the first email rather than on every process start
+        from celery_worker import send_email_batch
+        self._full.clear()
+        while self._pending:
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            try:
+                # Publishing to the broker is blocking I/O; keep it off the event loop
+                await asyncio.to_thread(send_email_batch.delay, [mail.to_dict() for mail in batch])
+            except Exception as exc:
+                self.dropped += len(batch)
+                print(f"❌ Could not queue {len(batch)} email(s): {exc!r}")
+            else:
+                self.batches += 1
+
+    async def close(self) -> None:
+        """Send what is still pending (on shutdown)"""
+        if self._flusher is not None and not self._flusher.done():
+            # Cut the window short rather than cancel a flush that is mid-publish
+            self._full.set()
+            await self._flusher
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "queued": self.queued,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+
+outbox = Outbox()
@@ -0,0 +1,115 @@
+# pagination.py
+import base64
+import hashlib
+import hmac
+import json
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+from sqlalchemy import bindparam, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from security import SECRET_KEY
+
+# Cursors are signed with a key derived from SECRET_KEY so clients cannot forge them
+_CURSOR_KEY = hashlib.sha256(b"cursor:" + SECRET_KEY.encode()).digest()
+
+NEXT = "next"
+PREV = "prev"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor is malformed or its signature does not match"""
+
+
+class KeysetPage(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def _sign(payload: bytes) -> str:
+    digest = hmac.new(_CURSOR_KEY, payload, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def encode_cursor(created_at: datetime, row_id: int, direction: str) -> str:
+    """Build an opaque, signed cursor pointing at (created_at, id)"""
+    payload = json.dumps([created_at.isoformat(), row_id, direction], separators=(",", ":")).encode()
+    body = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    return f"{body}.{_sign(payload)}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, str]:
+    """Verify a cursor and return its (created_at, id, direction)"""
+    try:
+        body, signature = cursor.split(".", 1)
+        payload = _b64decode(body)
+    except ValueError:
+        raise InvalidCursorError("Invalid cursor") from None
+    if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+        raise InvalidCursorError("Invalid cursor")
+    # The signature proves we built this payload, so it is well-formed
+    created_at, row_id, direction = json.loads(payload)
+    return datetime.fromisoformat(created_at), row_id, direction
+
+
+async def paginate_keyset(
+    db: AsyncSession,
+    query,
+    created_col,
+    id_col,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    scalars: bool = False
+) -> KeysetPage:
+    """
+    Fetch one page of `query` ordered by (created_col, id_col) using keyset pagination.
+    An empty or missing cursor starts at the first page. Each page costs one
+    index range scan no matter how deep it is, and no COUNT(*) is run.
+    """
+    key = tuple_(created_col, id_col)
+    direction = NEXT
+    if cursor:
+        created_at, row_id, direction = decode_cursor(cursor)
+        boundary = tuple_(
+            bindparam(None, created_at, type_=created_col.type),
+            bindparam(None, row_id, type_=id_col.type)
+        )
+        # Walking forward in a descending listing means going to smaller keys
+        if (direction == NEXT) != descending:
+            query = query.where(key > boundary)
+        else:
+            query = query.where(key < boundary)
+
+    # Paging backwards reads in reverse order and flips the rows afterwards
+    read_descending = (direction == PREV) != descending
+    if read_descending:
+        query = query.order_by(created_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(created_col.asc(), id_col.asc())
+
+    result = await db.execute(query.limit(limit + 1))
+    items = list(result.scalars() if scalars else result)
+    has_more = len(items) > limit
+    items = items[:limit]
+    if direction == PREV:
+        items.reverse()
+
+    def cursor_for(item, item_direction: str) -> str:
+        return encode_cursor(
+            getattr(item, created_col.key), getattr(item, id_col.key), item_direction
+        )
+
+    next_cursor = prev_cursor = None
+    if items:
+        if direction == NEXT:
+            next_cursor = cursor_for(items[-1], NEXT) if has_more else None
+            prev_cursor = cursor_for(items[0], PREV) if cursor else None
+        else:
+            next_cursor = cursor_for(items[-1], NEXT)
+            prev_cursor = cursor_for(items[0], PREV) if has_more else None
+    return KeysetPage(items, next_cursor, prev_cursor)
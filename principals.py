@@ -0,0 +1,104 @@
+# principals.py
+import asyncio
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import RedisCache, TTLCache
+from models import User
+
+load_dotenv()
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+# Shared tier for multi-worker deployments; leave unset for in-process only
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+INVALIDATION_CHANNEL = "principal:invalidate"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The part of a User needed to authorize a request"""
+    id: int
+    is_active: bool
+    is_admin: bool
+
+
+_local = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+_shared = RedisCache(CACHE_REDIS_URL, prefix="principal:", ttl=PRINCIPAL_CACHE_TTL) if CACHE_REDIS_URL else None
+
+# Bumped by every invalidation so a load that raced with one is not cached
+_invalidations = 0
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Get a user's principal from the cache, falling back to the database"""
+    principal = _local.get(user_id)
+    if principal is not None:
+        return principal
+
+    generation = _invalidations
+    if _shared is not None:
+        raw = await _shared.get(user_id)
+        if raw is not None:
+            principal = Principal(**json.loads(raw))
+            if generation == _invalidations:
+                _local.set(user_id, principal)
+            return principal
+
+    # Always read the primary: a lagging replica could undo a fresh deactivation
+    result = await db.execute(
+        select(User.id, User.is_active, User.is_admin)
+        .where(User.id == user_id)
+        .execution_options(use_primary=True)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    principal = Principal(id=row.id, is_active=bool(row.is_active), is_admin=bool(row.is_admin))
+    if generation == _invalidations:
+        _local.set(user_id, principal)
+        if _shared is not None:
+            await _shared.set(user_id, json.dumps(asdict(principal)))
+    return principal
+
+
+def _forget(user_ids) -> None:
+    global _invalidations
+    _invalidations += 1
+    for user_id in user_ids:
+        _local.pop(user_id)
+
+
+async def invalidate_principals(*user_ids: int) -> None:
+    """
+    Drop cached principals after their user rows change. Every code path
+    that updates a user (deactivation, role changes, ...) must call this.
+    """
+    _forget(user_ids)
+    if _shared is not None and user_ids:
+        await _shared.delete(*user_ids)
+        # Other workers drop their in-process copies when they see this
+        await _shared.publish(INVALIDATION_CHANNEL, json.dumps(list(user_ids)))
+
+
+async def _on_invalidation(message: str) -> None:
+    _forget(json.loads(message))
+
+
+def start_invalidation_listener() -> Optional[asyncio.Task]:
+    """Subscribe to invalidations from other workers (only with a Redis tier)"""
+    if _shared is None:
+        return None
+    return asyncio.create_task(_shared.listen(INVALIDATION_CHANNEL, _on_invalidation))
+
+
+def principal_cache_stats() -> Dict[str, Dict[str, int]]:
+    stats = {"local": _local.stats()}
+    if _shared is not None:
+        stats["redis"] = _shared.stats()
+    return stats
@@ -0,0 +1,220 @@
+# response_cache.py
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from cache import RedisCache, TTLCache
+from fast_json import FAST_JSON
+
+load_dotenv()
+
+# "memory" (per worker), "redis" (shared, needs CACHE_REDIS_URL) or "off"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 30))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2048))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag from the values that identify a representation"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    # Timestamps are stored as naive UTC (datetime.utcnow)
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match already names `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def not_modified(etag: str, last_modified: Optional[str] = None) -> Response:
+    """Empty 304 carrying the validators the client should keep"""
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return Response(status_code=304, headers=headers)
+
+
+@dataclass
+class CachedResponse:
+    body: str
+    etag: str
+    last_modified: Optional[str] = None
+
+    def to_response(self, request: Optional[Request] = None, hit: bool = True) -> Response:
+        if request is not None and etag_matches(request, self.etag):
+            return not_modified(self.etag, self.last_modified)
+        headers = {"ETag": self.etag, "X-Cache": "HIT" if hit else "MISS"}
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+@dataclass
+class CacheLookup:
+    """Result of ResponseCache.get; pass it to set() so the entry is stored under the generation read here"""
+    key: Optional[str]  # None when the generation is unknown: do not store
+    entry: Optional[CachedResponse] = None
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # A generation only needs to outlive the entries stored under the one before it
+        self.generations = TTLCache(maxsize=maxsize, ttl=ttl * 2)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        self.entries.set(key, value)
+
+    async def generation(self, namespace: str) -> Optional[str]:
+        generation = self.generations.get(namespace)
+        if generation is None:
+            # Expired or evicted: start a fresh one, never a constant that old entries may still use
+            generation = str(time.time_ns())
+            self.generations.set(namespace, generation)
+        return generation
+
+    async def bump(self, namespace: str) -> None:
+        self.generations.set(namespace, str(time.time_ns()))
+
+    def stats(self) -> Dict[str, int]:
+        return self.entries.stats()
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: float):
+        self.entries = RedisCache(url, prefix="response:", ttl=ttl)
+        self.generations = RedisCache(url, prefix="response-gen:", ttl=ttl * 2)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.entries.get(key)
+
+    async def set(self, key: str, value: str) -> None:
+        await self.entries.set(key, value)
+
+    async def generation(self, namespace: str) -> Optional[str]:
+        # Seeded once for all workers; None (do not cache) when Redis cannot be reached
+        return await self.generations.get_or_set(namespace, str(time.time_ns()))
+
+    async def bump(self, namespace: str) -> None:
+        await self.generations.set(namespace, str(time.time_ns()))
+
+    def stats(self) -> Dict[str, int]:
+        return self.entries.stats()
+
+
+class ResponseCache:
+    """
+    Caches rendered JSON responses keyed by route, path and query parameters.
+    Keys live in a namespace (e.g. "post:42" or "posts:list"); invalidating a
+    namespace bumps its generation, which orphans every key built under the
+    old one without having to enumerate them.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def _key(self, request: Request, namespace: str) -> Optional[str]:
+        generation = await self.backend.generation(namespace)
+        if generation is None:
+            return None
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        return f"{namespace}:{generation}:{request.url.path}?{query}"
+
+    async def get(self, request: Request, namespace: str) -> CacheLookup:
+        """
+        Look up the response; on a miss, hand the lookup to set() after
+        reading the data. The generation is read only here, so data read
+        while the namespace is invalidated lands under the old generation
+        and is never served.
+        """
+        if self.backend is None:
+            return CacheLookup(key=None)
+        key = await self._key(request, namespace)
+        if key is None:
+            return CacheLookup(key=None)
+        raw = await self.backend.get(key)
+        return CacheLookup(key=key, entry=CachedResponse(**json.loads(raw)) if raw is not None else None)
+
+    async def set(
+        self,
+        lookup: CacheLookup,
+        content: Any,
+        etag: Optional[str] = None,
+        last_modified: Optional[datetime] = None,
+        exclude_unset: bool = False
+    ) -> CachedResponse:
+        """Render `content` exactly as FastAPI would and store it"""
+        if isinstance(content, BaseModel) and FAST_JSON:
+            # Same bytes, encoded by pydantic-core in one pass
+            body = content.model_dump_json(by_alias=True, exclude_unset=exclude_unset)
+        else:
+            if isinstance(content, BaseModel):
+                content = content.model_dump(mode="json", by_alias=True, exclude_unset=exclude_unset)
+            body = JSONResponse(jsonable_encoder(content)).body.decode()
+        entry = CachedResponse(
+            body=body,
+            etag=etag or make_etag(body),
+            last_modified=http_date(last_modified) if last_modified else None
+        )
+        if self.backend is not None and lookup.key is not None:
+            await self.backend.set(lookup.key, json.dumps(asdict(entry)))
+        return entry
+
+    async def invalidate(self, *namespaces: str) -> None:
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            await self.backend.bump(namespace)
+
+    def stats(self) -> Dict[str, int]:
+        return self.backend.stats() if self.backend is not None else {}
+
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND == "redis" and CACHE_REDIS_URL:
+        return RedisBackend(CACHE_REDIS_URL, RESPONSE_CACHE_TTL)
+    if RESPONSE_CACHE_BACKEND == "off":
+        return None
+    return MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+
+response_cache = ResponseCache(_make_backend())
+
+POST_LIST_NAMESPACE = "posts:list"
+
+
+def post_namespace(post_id: int) -> str:
+    return f"post:{post_id}"
+
+
+def post_etag(post_id: int, modified: datetime) -> str:
+    return make_etag("post", post_id, modified.isoformat())
+
+
+async def invalidate_posts(*post_ids: int) -> None:
+    """Call after posts are created or updated: drops listings and those posts"""
+    await response_cache.invalidate(POST_LIST_NAMESPACE, *(post_namespace(i) for i in post_ids))
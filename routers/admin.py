@@ -1,56 +1,155 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+import os
+from typing import Union
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, func
-from database import get_db
+from database import AsyncSessionLocal, get_db, pool_stats, replicas
 from models import User
+from schemas import (
+    AdminStats, UserBulkStatusRequest, UserBulkStatusResult, UserCursorPage, UserOut, UserPage, UserPageHasMore
+)
+from crud import set_users_active, user_bulk_filters, user_list_filters
+from counts import COUNT_STRATEGY_PATTERN, count_users, exact_user_count, invalidate_user_counts
+from jobs import Job, jobs
+from outbox import outbox
+from services_export import MEDIA_TYPES, USER_EXPORT_COLUMNS, export_filename, stream_export
 from routers.auth import get_current_admin  # JWT admin dependency
+from pagination import InvalidCursorError, paginate_keyset
+from response_cache import response_cache
+from principals import Principal, invalidate_principals, principal_cache_stats
+from security import token_cache_stats
+from hashing import password_hasher
+from upstream import upstream
+from singleflight import flight
+from fast_json import model_instances, model_response
 
 router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
 
+# Bulk status changes touching more users than this run as a background job
+BULK_STATUS_SYNC_LIMIT = int(os.getenv("BULK_STATUS_SYNC_LIMIT", 1000))
+# Rows per UPDATE (and per commit) in a background bulk status job
+BULK_STATUS_BATCH_SIZE = int(os.getenv("BULK_STATUS_BATCH_SIZE", 500))
+
+USER_SORT_PATTERN = "^-?(id|created_at|post_count|last_post_at)$"
+SEARCH_MODE_PATTERN = "^(contains|prefix)$"
+
 # --------------------------
 # GET /users - List users with pagination, search, and active filter
 # --------------------------
-@router.get("/users")
+@router.get(
+    "/users",
+    response_model=Union[UserPage, UserPageHasMore, UserCursorPage],
+    response_model_exclude_unset=True
+)
 async def list_users(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(10, ge=1, le=100, description="Number of users per page"),
     search: str = Query(None, description="Search by email substring"),
+    search_mode: str = Query("contains", pattern=SEARCH_MODE_PATTERN, description="contains (substring) or prefix (email starts with; fastest)"),
     active: bool = Query(None, description="Filter active/inactive users"),
+    cursor: str = Query(None, description="Cursor mode: pass an empty value for the first page, then next_cursor/prev_cursor"),
+    sort: str = Query("id", pattern=USER_SORT_PATTERN, description="Sort key, prefix with - for descending (e.g. -post_count)"),
+    count: str = Query("exact", pattern=COUNT_STRATEGY_PATTERN, description="Total: exact, cached, estimated, or none (has_more only)"),
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ):
     """
     List users (admin-only).
-    Supports pagination, search by email, and active/inactive filtering.
+    Supports pagination, search by email (substring or prefix), active/inactive filtering and
+    sorting by activity (post_count, last_post_at) without aggregating posts.
+    `count` picks how the total is computed: exact COUNT(*), a cached exact
+    count, a planner estimate (flagged with total_estimated), or none, which
+    returns has_more instead of a total.
+    Passing `cursor` switches to keyset pagination on (created_at, id),
+    which returns next_cursor/prev_cursor instead of a total.
     """
-    query = select(User)
-    
-    if search:
-        query = query.where(User.email.ilike(f"%{search}%"))
-    
-    if active is not None:
-        query = query.where(User.is_active == active)
-
-    # Apply pagination
-    query = query.offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    users = result.scalars().all()
+    filters = user_list_filters(search, active, search_mode, db.get_bind().dialect.name)
+    query = select(User).where(*filters)
 
-    # Efficient total count
-    count_query = select(func.count()).select_from(User)
-    if search:
-        count_query = count_query.where(User.email.ilike(f"%{search}%"))
-    if active is not None:
-        count_query = count_query.where(User.is_active == active)
-    count_result = await db.execute(count_query)
-    total_users = count_result.scalar()  # single integer
+    if cursor is not None:
+        if sort != "id":
+            raise HTTPException(status_code=400, detail="Cursor mode is always ordered by created_at")
+        try:
+            keyset_page = await paginate_keyset(
+                db, query, User.created_at, User.id, cursor, limit, scalars=True
+            )
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return model_response(UserCursorPage, {
+            "limit": limit,
+            "next_cursor": keyset_page.next_cursor,
+            "prev_cursor": keyset_page.prev_cursor,
+            "users": model_instances(UserOut, keyset_page.items)
+        }, exclude_unset=True)
 
-    return {
+    # Apply sorting and pagination; id breaks ties so pages never overlap
+    key = sort.lstrip("-")
+    column = getattr(User, key)
+    order = column.desc() if sort.startswith("-") else column.asc()
+    if key == "last_post_at":
+        # Users who never posted go last either way
+        order = order.nulls_last()
+    query = query.order_by(order)
+    if column is not User.id:
+        query = query.order_by(User.id.desc() if sort.startswith("-") else User.id.asc())
+    query = query.offset((page - 1) * limit)
+
+    if count == "none":
+        # One extra row tells whether another page exists, no COUNT needed
+        result = await db.execute(query.limit(limit + 1))
+        users = result.scalars().all()
+        return model_response(UserPageHasMore, {
+            "page": page,
+            "limit": limit,
+            "has_more": len(users) > limit,
+            "users": model_instances(UserOut, users[:limit])
+        }, exclude_unset=True)
+
+    result = await db.execute(query.limit(limit))
+    users = result.scalars().all()
+
+    total_users, estimated = await count_users(
+        db, filters, count, cache_key=(search, search_mode, active)
+    )
+    response = {
         "total": total_users,
         "page": page,
         "limit": limit,
-        "users": users
+        "users": model_instances(UserOut, users)
     }
+    if estimated:
+        response["total_estimated"] = True
+    return model_response(UserPage, response, exclude_unset=True)
+
+# --------------------------
+# GET /users/export - Stream all matching users as NDJSON or CSV
+# --------------------------
+@router.get("/users/export")
+async def export_users(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    search: str = Query(None, description="Search by email substring"),
+    search_mode: str = Query("contains", pattern=SEARCH_MODE_PATTERN, description="contains (substring) or prefix (email starts with)"),
+    active: bool = Query(None, description="Filter active/inactive users"),
+    admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Export users (admin-only) with the same filters as the listing.
+    Rows are streamed from a server-side cursor, so memory use stays flat.
+    """
+    filters = user_list_filters(search, active, search_mode, db.get_bind().dialect.name)
+
+    async def build_query(session, query):
+        return query.where(*filters).order_by(User.id)
+
+    # Hand back the connection used for auth; the export streams on its own session
+    await db.close()
+    return StreamingResponse(
+        stream_export(USER_EXPORT_COLUMNS, build_query, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("users", export_format)}"'}
+    )
 
 # --------------------------
 # POST /users/{user_id}/deactivate - Deactivate user
@@ -59,7 +158,7 @@ async def list_users(
 async def deactivate_user(
     user_id: int,
     db: AsyncSession = Depends(get_db),
-    admin: User = Depends(get_current_admin)
+    admin: Principal = Depends(get_current_admin)
 ):
     """
     Deactivate a user by ID.
@@ -76,5 +175,157 @@ async def deactivate_user(
     stmt = update(User).where(User.id == user_id).values(is_active=False)
     await db.execute(stmt)
     await db.commit()
+    # Drop the cached principal so the deactivation applies to the next request
+    await invalidate_principals(user_id)
+    invalidate_user_counts()
 
     return {"detail": f"User {user.email} has been deactivated"}
+
+# --------------------------
+# POST /users/bulk-deactivate, /users/bulk-activate - Set is_active on many users
+# --------------------------
+async def _users_status_changed(user_ids) -> None:
+    # Deactivations must apply to the users' next requests
+    await invalidate_principals(*user_ids)
+    invalidate_user_counts()
+
+async def _run_bulk_status(job: Job, filters: list, active: bool) -> None:
+    """Update in id order, one committed batch at a time, so locks stay short"""
+    after_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            user_ids = await set_users_active(db, filters, active, BULK_STATUS_BATCH_SIZE, after_id)
+            await db.commit()
+            if not user_ids:
+                break
+            await _users_status_changed(user_ids)
+            job.processed += len(user_ids)
+            after_id = user_ids[-1]
+    job.result = {"updated": job.processed}
+
+async def _bulk_set_active(
+    body: UserBulkStatusRequest,
+    active: bool,
+    response: Response,
+    db: AsyncSession,
+    admin: Principal
+) -> UserBulkStatusResult:
+    if body.ids is None and not (body.email_pattern or body.created_after or body.created_before):
+        raise HTTPException(status_code=400, detail="Provide ids or at least one filter")
+
+    filters = user_bulk_filters(body.ids, body.email_pattern, body.created_after, body.created_before)
+    if not active:
+        # Admins cannot lock themselves out
+        filters.append(User.id != admin.id)
+
+    if body.ids is not None and len(body.ids) <= BULK_STATUS_SYNC_LIMIT:
+        matched = None  # small by construction, no need to count first
+    else:
+        matched = await exact_user_count(db, [*filters, User.is_active.isnot(active)])
+
+    if matched is not None and matched > BULK_STATUS_SYNC_LIMIT:
+        job = jobs.start(
+            "bulk-activate" if active else "bulk-deactivate",
+            lambda job: _run_bulk_status(job, filters, active)
+        )
+        response.status_code = 202
+        return UserBulkStatusResult(matched=matched, updated=0, job_id=job.id)
+
+    user_ids = await set_users_active(db, filters, active)
+    await db.commit()
+    if user_ids:
+        await _users_status_changed(user_ids)
+    return UserBulkStatusResult(matched=len(user_ids), updated=len(user_ids), user_ids=user_ids)
+
+@router.post("/users/bulk-deactivate", response_model=UserBulkStatusResult)
+async def bulk_deactivate_users(
+    body: UserBulkStatusRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    Deactivate every user matching `ids` and/or the filters (combined with AND),
+    except the calling admin, with one set-based UPDATE.
+    More than BULK_STATUS_SYNC_LIMIT users are deactivated by a background
+    job instead: the response is 202 with a job_id for GET /jobs/{job_id}.
+    """
+    return await _bulk_set_active(body, False, response, db, admin)
+
+@router.post("/users/bulk-activate", response_model=UserBulkStatusResult)
+async def bulk_activate_users(
+    body: UserBulkStatusRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
+    """Reactivate users; same criteria and background behaviour as bulk-deactivate."""
+    return await _bulk_set_active(body, True, response, db, admin)
+
+# --------------------------
+# GET /jobs/{job_id} - Status of a background admin job
+# --------------------------
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, admin: Principal = Depends(get_current_admin)):
+    """
+    Progress of a background job started by this worker.
+    Jobs are kept in memory, so poll the worker that started them.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+# --------------------------
+# GET /stats - Dashboard totals from the denormalized counters
+# --------------------------
+@router.get("/stats", response_model=AdminStats)
+async def get_stats(
+    db: AsyncSession = Depends(get_db),
+    admin: Principal = Depends(get_current_admin)
+):
+    """
+    User and post totals plus the most active users.
+    Read from users.post_count, so the posts table is never scanned.
+    """
+    totals = (await db.execute(
+        select(
+            func.count(User.id),
+            func.count(User.id).filter(User.is_active.is_(True)),
+            func.coalesce(func.sum(User.post_count), 0),
+            func.max(User.last_post_at)
+        )
+    )).one()
+    result = await db.execute(
+        select(User).order_by(User.post_count.desc(), User.id).limit(5)
+    )
+    return model_response(AdminStats, {
+        "users": totals[0],
+        "active_users": totals[1],
+        "posts": totals[2],
+        "last_post_at": totals[3],
+        "most_active": model_instances(UserOut, result.scalars().all())
+    })
+
+# --------------------------
+# GET /metrics - Cache, executor and DB pool counters for this worker
+# --------------------------
+@router.get("/metrics")
+async def get_metrics(admin: Principal = Depends(get_current_admin)):
+    """
+    In-process counters of this worker's caches, password hashing queue,
+    database connection pools and upstream API client.
+    Only accessible by admin users.
+    """
+    return {
+        "token_cache": token_cache_stats(),
+        "principal_cache": principal_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "db_pool": pool_stats(),
+        "db_replicas": replicas.stats(),
+        "upstream": upstream.stats(),
+        "singleflight": flight.stats(),
+        "jobs": jobs.stats(),
+        "outbox": outbox.stats()
+    }
@@ -1,16 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from database import get_db
+from database import get_db, set_write_scope
 from schemas import UserCreate, UserOut, Token
 from crud import create_user, get_user_by_email, authenticate_user
-from security import create_access_token, create_refresh_token, SECRET_KEY, ALGORITHM
-from models import User
-import jwt
+from security import create_access_token, create_refresh_token, decode_token
+from principals import Principal, load_principal
+from fast_json import model_response
 
-# 🚀 ADD THIS IMPORT FOR CELERY TASK
-from celery_worker import send_welcome_email
+# 🚀 Welcome emails are batched and sent by Celery
+from outbox import outbox
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -34,11 +33,11 @@ async def register(
     # Create new user (normal user, is_admin=False)
     user = await create_user(db, payload.email, payload.password, payload.full_name)
     
-    # 🚀 SEND WELCOME EMAIL IN BACKGROUND (NON-BLOCKING)
-    send_welcome_email.delay(user.email, user.full_name or "User")
+    # 🚀 SEND WELCOME EMAIL IN BACKGROUND (NON-BLOCKING, BATCHED)
+    outbox.queue(user.email, "welcome", full_name=user.full_name or "User")
     print(f"✨ User {user.email} registered! Welcome email task queued.")
     
-    return user
+    return model_response(UserOut, user, status_code=status.HTTP_201_CREATED)
 
 # --------------------------
 # User Login Endpoint
@@ -81,23 +80,22 @@ security = HTTPBearer()
 async def get_current_admin(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
-):
+) -> Principal:
     """
     Dependency for admin-only routes.
     Verifies JWT and ensures user is an admin.
     """
     token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except Exception:
+    user_id = decode_token(token)
+    if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
-    # Get user from DB
-    q = await db.execute(select(User).where(User.id == user_id))
-    user = q.scalars().first()
+    # Get user from the principal cache (DB on a miss)
+    user = await load_principal(db, user_id)
     
     if not user or not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin privileges required")
     
+    # Reads right after this admin's own writes go to the primary
+    set_write_scope(("user", user.id))
     return user
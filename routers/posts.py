@@ -1,18 +1,44 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, status
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Optional, List, Union
+import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from database import get_db
 from dependencies import get_current_user
-from models import User, Post
-from schemas_post import PostCreate, PostOut, ExternalPost, ExternalPostList
+from models import Post
+from principals import Principal
+from schemas_post import (
+    PostCreate, PostOut, PostBulkResult, ExternalPost, ExternalPostList, ExternalPostCursorPage
+)
 from services_post import (
+    BULK_CHUNK_SIZE,
+    BulkLimitExceeded,
+    apply_post_search,
     fetch_db_post_by_id,
-    fetch_all_external_posts,
     fetch_external_post_by_id,
-    search_posts,
-    paginate_posts
+    fetch_post_modified_at,
+    fetch_posts_by_ids,
+    fetch_user_post_count,
+    ingest_posts,
+    query_external_posts,
+    query_external_posts_keyset,
+    query_user_post_versions_page,
+    record_new_posts
+)
+from pagination import InvalidCursorError
+from response_cache import (
+    POST_LIST_NAMESPACE,
+    etag_matches,
+    http_date,
+    invalidate_posts,
+    make_etag,
+    not_modified,
+    post_etag,
+    post_namespace,
+    response_cache
 )
+from fast_json import model_response
+from services_export import MEDIA_TYPES, POST_EXPORT_COLUMNS, export_filename, stream_export
 
 router = APIRouter(prefix="/api/v1/posts", tags=["Posts"])
 
@@ -20,7 +46,7 @@ router = APIRouter(prefix="/api/v1/posts", tags=["Posts"])
 @router.post("", response_model=PostOut, status_code=status.HTTP_201_CREATED)
 async def create_post(
     post_data: PostCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     new_post = Post(
@@ -29,44 +55,234 @@ async def create_post(
         user_id=current_user.id
     )
     db.add(new_post)
+    await db.flush()
+    await record_new_posts(db, current_user.id, 1, new_post.created_at)
     await db.commit()
     await db.refresh(new_post)
-    return new_post
+    await invalidate_posts()
+    return model_response(PostOut, new_post, status_code=status.HTTP_201_CREATED)
+
+
+# ----------------- BULK CREATE POSTS -----------------
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return ValueError(f"Invalid JSON: {exc}")
+
+
+async def _ndjson_items(request: Request) -> AsyncIterator[Any]:
+    # Parse line by line as the body arrives instead of buffering all of it
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_ndjson_line(line)
+    if buffer.strip():
+        yield _parse_ndjson_line(buffer)
+
+
+async def _json_array_items(request: Request) -> AsyncIterator[Any]:
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        items = None
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or NDJSON"
+        )
+    for item in items:
+        yield item
+
+
+@router.post(
+    "/bulk",
+    response_model=PostBulkResult,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": PostCreate.model_json_schema()}},
+                "application/x-ndjson": {"schema": {"type": "string"}}
+            }
+        }
+    }
+)
+async def create_posts_bulk(
+    request: Request,
+    chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=10000, description="Rows per INSERT batch"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Create many posts at once from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson). Invalid items are skipped and
+    reported by index; valid ones are inserted in batches.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        items = _ndjson_items(request)
+    else:
+        items = _json_array_items(request)
+
+    try:
+        result = await ingest_posts(db, current_user.id, items, chunk_size)
+    except BulkLimitExceeded as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(exc))
+    if result.created:
+        await invalidate_posts()
+    return result
 
 
 # ----------------- GET MY POSTS -----------------
 @router.get("/my-posts", response_model=List[PostOut])
 async def get_my_posts(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100, description="Posts per page"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor/X-Prev-Cursor of a previous page"),
+    total: bool = Query(False, description="Add X-Total-Count with the number of posts"),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(
-        select(Post).where(Post.user_id == current_user.id).order_by(Post.created_at.desc())
+    """
+    The current user's posts, newest first, one keyset page at a time.
+    The next and previous pages are linked by the X-Next-Cursor and
+    X-Prev-Cursor headers; the body stays a plain list.
+    X-Total-Count comes from the user's post counter, not a COUNT(*).
+    """
+    try:
+        page = await query_user_post_versions_page(db, current_user.id, cursor, limit)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    headers = {}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if page.prev_cursor:
+        headers["X-Prev-Cursor"] = page.prev_cursor
+    if total:
+        headers["X-Total-Count"] = str(await fetch_user_post_count(db, current_user.id))
+
+    # Ids and change times decide the ETag; titles and bodies are loaded only on a miss
+    etag = make_etag(
+        "my-posts", current_user.id, limit, cursor, sorted(headers.items()),
+        [(row.id, row.modified_at.isoformat()) for row in page.items]
     )
-    return result.scalars().all()
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    posts = await fetch_posts_by_ids(db, [row.id for row in page.items])
+    response.headers.update(headers)
+    response.headers["ETag"] = etag
+    return model_response(PostOut, posts, response)
 
 
 # ----------------- EXTERNAL POSTS (List) -----------------
 # ----------------- EXTERNAL POSTS (List) -----------------
-@router.get("/external", response_model=ExternalPostList)
+@router.get(
+    "/external",
+    response_model=Union[ExternalPostList, ExternalPostCursorPage],
+    response_model_exclude_unset=True
+)
 async def get_external_posts(
+    request: Request,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None),
+    search: Optional[str] = Query(None, description="Full-text search; results are ranked and highlighted"),
+    cursor: Optional[str] = Query(None, description="Cursor mode: pass an empty value for the first page, then next_cursor/prev_cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size in cursor mode (defaults to size)"),
     db: AsyncSession = Depends(get_db)  # Add database dependency
 ):
-    all_posts = await fetch_all_external_posts(db)  # Fetch from YOUR DB
-    if search:
-        all_posts = search_posts(all_posts, search)
-    paginated_posts, total = paginate_posts(all_posts, page, size)
-    return ExternalPostList(total=total, page=page, size=size, posts=paginated_posts)
+    cached = await response_cache.get(request, POST_LIST_NAMESPACE)
+    if cached.entry is not None:
+        return cached.entry.to_response(request)
+
+    if cursor is not None:
+        # Keyset pagination: constant cost per page and no total count
+        try:
+            keyset_page = await query_external_posts_keyset(db, cursor, limit or size, search)
+        except InvalidCursorError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        content = ExternalPostCursorPage(
+            limit=limit or size,
+            next_cursor=keyset_page.next_cursor,
+            prev_cursor=keyset_page.prev_cursor,
+            posts=keyset_page.items
+        )
+    else:
+        # Filter, count and slice in SQL so only the requested page is loaded
+        paginated_posts, total = await query_external_posts(db, page, size, search)
+        content = ExternalPostList(total=total, page=page, size=size, posts=paginated_posts)
+
+    entry = await response_cache.set(cached, content, exclude_unset=True)
+    return entry.to_response(request, hit=False)
+
+
+# ----------------- EXTERNAL POST (Upstream API) -----------------
+@router.get("/external/{post_id}", response_model=ExternalPost, response_model_exclude_unset=True)
+async def get_external_post(post_id: int):
+    """Single post from the upstream API (jsonplaceholder), cached and retried"""
+    post = await fetch_external_post_by_id(post_id)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found upstream")
+    return post
+
+
+# ----------------- EXPORT POSTS -----------------
+@router.get("/export")
+async def export_posts(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    search: Optional[str] = Query(None, description="Same search as the external listing"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stream all matching posts as NDJSON or CSV from a server-side cursor,
+    so memory use stays flat however large the table is.
+    """
+    async def build_query(session, query):
+        query = await apply_post_search(session, query, search)
+        return query.order_by(Post.id)
 
+    # Hand back the connection used for auth; the export streams on its own session
+    await db.close()
+    return StreamingResponse(
+        stream_export(POST_EXPORT_COLUMNS, build_query, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename("posts", export_format)}"'}
+    )
 
 
 # ----------------- DB POST BY ID (Dynamic route last!) -----------------
 @router.get("/{post_id}", response_model=PostOut)
-async def get_db_post(post_id: int, db: AsyncSession = Depends(get_db)):
+async def get_db_post(post_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    # Popular posts are answered from the response cache without touching the DB
+    cached = await response_cache.get(request, post_namespace(post_id))
+    if cached.entry is not None:
+        return cached.entry.to_response(request)
+
+    if request.headers.get("if-none-match"):
+        # Revalidation: check the timestamp before loading the whole row
+        modified_at = await fetch_post_modified_at(post_id, db)
+        if modified_at is not None and etag_matches(request, post_etag(post_id, modified_at)):
+            return not_modified(post_etag(post_id, modified_at), http_date(modified_at))
+
     post = await fetch_db_post_by_id(post_id, db)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found in DB")
-    return post
+    modified_at = post.updated_at or post.created_at
+    entry = await response_cache.set(
+        cached,
+        PostOut.model_validate(post),
+        etag=post_etag(post.id, modified_at),
+        last_modified=modified_at
+    )
+    return entry.to_response(hit=False)
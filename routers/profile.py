@@ -1,14 +1,43 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from crud import get_user_by_id, get_user_modified_at
+from database import get_db
 from schemas import UserOut
 from dependencies import get_current_user
-from models import User
+from principals import Principal
+from fast_json import model_response
+from response_cache import etag_matches, http_date, make_etag, not_modified
 
 router = APIRouter(prefix="/api/v1/profile", tags=["Profile"])
 
 @router.get("/me", response_model=UserOut)
-async def get_my_profile(current_user: User = Depends(get_current_user)):
+async def get_my_profile(
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Get current user's profile
     You must be logged in to use this endpoint
+    Send If-None-Match with the last ETag to get 304 when nothing changed
     """
-    return current_user
\ No newline at end of file
+    if request.headers.get("if-none-match"):
+        modified_at = await get_user_modified_at(db, current_user.id)
+        if modified_at is not None and etag_matches(request, _profile_etag(current_user.id, modified_at)):
+            return not_modified(_profile_etag(current_user.id, modified_at), http_date(modified_at))
+
+    user = await get_user_by_id(db, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    modified_at = user.updated_at or user.created_at
+    response.headers["ETag"] = _profile_etag(user.id, modified_at)
+    response.headers["Last-Modified"] = http_date(modified_at)
+    return model_response(UserOut, user, response)
+
+
+def _profile_etag(user_id: int, modified_at) -> str:
+    return make_etag("profile", user_id, modified_at.isoformat())
\ No newline at end of file
@@ -1,23 +1,68 @@
 # schemas.py
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, WithJsonSchema
+from typing import Annotated, List, Optional
 from datetime import datetime
 
+# An address that was validated as EmailStr when it was stored: documented as
+# EmailStr (format: email), but not re-checked with email-validator on the way out
+StoredEmail = Annotated[str, WithJsonSchema({"type": "string", "format": "email"})]
+
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
     full_name: Optional[str] = None
 
 class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
-    email: EmailStr
+    email: StoredEmail
     full_name: Optional[str]
     is_active: bool
     is_admin: bool
     created_at: datetime
+    post_count: int = 0
+    last_post_at: Optional[datetime] = None
+
+# Admin user listing, one schema per pagination mode
+class UserPage(BaseModel):
+    total: int
+    page: int
+    limit: int
+    users: List[UserOut]
+    total_estimated: Optional[bool] = None  # only set when total is a planner estimate
+
+class UserPageHasMore(BaseModel):
+    page: int
+    limit: int
+    has_more: bool
+    users: List[UserOut]
+
+class UserCursorPage(BaseModel):
+    limit: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+    users: List[UserOut]
+
+class AdminStats(BaseModel):
+    users: int
+    active_users: int
+    posts: int
+    last_post_at: Optional[datetime]
+    most_active: List[UserOut]
+
+class UserBulkStatusRequest(BaseModel):
+    """Users to (de)activate: explicit ids and/or a filter, combined with AND"""
+    ids: Optional[List[int]] = None
+    email_pattern: Optional[str] = None  # case-insensitive LIKE, e.g. "%@spam.example"
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+class UserBulkStatusResult(BaseModel):
+    matched: int
+    updated: int
+    user_ids: List[int] = []
+    job_id: Optional[str] = None  # set when the update runs as a background job
 
 class Token(BaseModel):
     access_token: str
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, validator
+from pydantic import BaseModel, ConfigDict, field_validator
 from typing import List, Optional
 from datetime import datetime
 
@@ -6,31 +6,32 @@ from datetime import datetime
 class PostCreate(BaseModel):
     title: str
     body: str
-    
-    @validator('title')
-    def title_length(cls, v):
+
+    @field_validator('title')
+    @classmethod
+    def title_length(cls, v: str) -> str:
         if len(v) < 3:
             raise ValueError('Title must be at least 3 characters')
         if len(v) > 255:
             raise ValueError('Title must be less than 255 characters')
         return v
-    
-    @validator('body')
-    def body_length(cls, v):
+
+    @field_validator('body')
+    @classmethod
+    def body_length(cls, v: str) -> str:
         if len(v) < 10:
             raise ValueError('Body must be at least 10 characters')
         return v
 
 # For returning a post
 class PostOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     title: str
     body: str
     user_id: int
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
 
 # External API post (from JSONPlaceholder)
 class ExternalPost(BaseModel):
@@ -38,10 +39,32 @@ class ExternalPost(BaseModel):
     id: int
     title: str
     body: str
+    # Only set for full-text search results
+    rank: Optional[float] = None
+    highlight: Optional[str] = None
 
 # For listing external posts
 class ExternalPostList(BaseModel):
     total: int
     page: int
     size: int
-    posts: List[ExternalPost]
\ No newline at end of file
+    posts: List[ExternalPost]
+
+# For listing external posts with cursor (keyset) pagination
+class ExternalPostCursorPage(BaseModel):
+    limit: int
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+    posts: List[ExternalPost]
+
+# Per-item failure in a bulk import (index is the item's position in the input)
+class PostBulkError(BaseModel):
+    index: int
+    errors: List[str]
+
+# Result of POST /api/v1/posts/bulk
+class PostBulkResult(BaseModel):
+    created: int
+    failed: int
+    ids: List[int]
+    errors: List[PostBulkError]
@@ -1,9 +1,12 @@
 # security.py
+import hashlib
 import os
+import time
 from datetime import datetime, timedelta
-from jose import jwt
-from passlib.context import CryptContext
+from functools import lru_cache
+import jwt
 from dotenv import load_dotenv
+from cache import TTLCache
 
 load_dotenv()
 
@@ -11,14 +14,19 @@ SECRET_KEY = os.getenv("SECRET_KEY", "secret")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 REFRESH_EXPIRE_MINUTES = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", 10080))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def _pwd_context():
+    # passlib is only needed by login/register, not to serve authenticated requests
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pwd_context().verify(plain_password, hashed_password)
 
 def create_access_token(user_id: int) -> str:
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_EXPIRE_MINUTES)
@@ -30,9 +38,28 @@ def create_refresh_token(user_id: int) -> str:
     payload = {"sub": str(user_id), "exp": expire}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
+# Verified tokens: sha256(token) -> (sub, exp), each entry expiring at the token's exp
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE)
+
 def decode_token(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        return cached[0]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return int(payload.get("sub"))
+        user_id = int(payload.get("sub"))
     except Exception:
         return None
+
+    # Only tokens with an expiry are cached, and never past that expiry
+    exp = payload.get("exp")
+    if exp is not None:
+        remaining = exp - time.time()
+        if remaining > 0:
+            _token_cache.set(key, (user_id, exp), ttl=remaining)
+    return user_id
+
+def token_cache_stats() -> dict:
+    return _token_cache.stats()
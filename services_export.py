@@ -0,0 +1,73 @@
+# services_export.py
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Sequence
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import Post, User
+
+load_dotenv()
+
+# Rows fetched per round trip from the server-side cursor (and per output chunk)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+POST_EXPORT_COLUMNS = (Post.id, Post.user_id, Post.title, Post.body, Post.created_at, Post.updated_at)
+USER_EXPORT_COLUMNS = (User.id, User.email, User.full_name, User.is_active, User.is_admin, User.created_at)
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode_ndjson(names: Sequence[str], rows) -> str:
+    return "".join(
+        json.dumps({name: _plain(value) for name, value in zip(names, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _encode_csv(names: Sequence[str], rows, header: bool) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(names)
+    writer.writerows([_plain(value) for value in row] for row in rows)
+    return out.getvalue()
+
+
+async def stream_export(
+    columns: Sequence,
+    build_query: Callable[[AsyncSession, Any], Any],
+    export_format: str
+) -> AsyncIterator[str]:
+    """
+    Stream every row of a query as NDJSON or CSV through a server-side cursor,
+    holding at most EXPORT_BATCH_SIZE rows in memory. The export uses its own
+    session because it outlives the request handler that returns the response.
+    `build_query(session, base_select)` adds the filters to the base select.
+    """
+    names = [column.key for column in columns]
+    async with AsyncSessionLocal() as session:
+        query = await build_query(session, select(*columns))
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if export_format == "csv":
+            first = True
+            async for rows in result.partitions():
+                yield _encode_csv(names, rows, header=first)
+                first = False
+            if first:
+                yield _encode_csv(names, [], header=True)
+        else:
+            async for rows in result.partitions():
+                yield _encode_ndjson(names, rows)
+
+
+def export_filename(name: str, export_format: str) -> str:
+    return f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}.{export_format}"
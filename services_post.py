@@ -1,65 +1,248 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from models import Post
-from schemas_post import ExternalPost
-from typing import Optional, List, Tuple
-import httpx
+from sqlalchemy import case, func, insert, or_, update
+from pydantic import ValidationError
+from models import Post, User
+from schemas_post import ExternalPost, PostCreate, PostBulkError, PostBulkResult
+from services_search import get_search_backend, search_posts_fulltext, fulltext_filter
+from pagination import KeysetPage, paginate_keyset
+from singleflight import coalesced_lookup
+from typing import Any, AsyncIterator, Optional, List, Tuple
+from datetime import datetime
+from dotenv import load_dotenv
+from upstream import upstream
+import os
 
-POSTS_API_URL = "https://jsonplaceholder.typicode.com/posts"
+load_dotenv()
+
+# Relative to UPSTREAM_BASE_URL (jsonplaceholder by default)
+POSTS_API_PATH = "/posts"
+
+# Bulk import: rows per INSERT ... RETURNING batch, and the most items one request may hold
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 100000))
+
+
+class BulkLimitExceeded(Exception):
+    """Raised when a bulk import holds more than BULK_MAX_ITEMS items"""
 
 # ----------------- DB POST -----------------
 async def fetch_db_post_by_id(post_id: int, db: AsyncSession) -> Optional[Post]:
     """Fetch a single post from your database by ID"""
-    result = await db.execute(select(Post).where(Post.id == post_id))
-    return result.scalar_one_or_none()
-
-
-async def fetch_all_external_posts(db: AsyncSession) -> List[ExternalPost]:
-    """Fetch all posts from your database"""
-    result = await db.execute(select(Post))
-    posts = result.scalars().all()
-    
-    # Convert your Post model to ExternalPost format
-    return [
-        ExternalPost(
-            userId=post.user_id,
-            id=post.id,
-            title=post.title,
-            body=post.body
-        ) 
-        for post in posts
+    async def load():
+        result = await db.execute(select(Post).where(Post.id == post_id))
+        return result.scalar_one_or_none()
+
+    # Concurrent requests for the same post share one query
+    return await coalesced_lookup(db, ("post", post_id), load)
+
+
+async def fetch_post_modified_at(post_id: int, db: AsyncSession) -> Optional[datetime]:
+    """When a post last changed, without loading its body"""
+    async def load():
+        result = await db.execute(
+            select(func.coalesce(Post.updated_at, Post.created_at)).where(Post.id == post_id)
+        )
+        return result.scalar_one_or_none()
+
+    return await coalesced_lookup(db, ("post_modified_at", post_id), load)
+
+
+async def query_user_post_versions_page(
+    db: AsyncSession,
+    user_id: int,
+    cursor: Optional[str],
+    limit: int
+) -> KeysetPage:
+    """
+    One page of a user's posts, newest first (served by ix_posts_user_id_created_at_id),
+    as (id, created_at, modified_at) rows: enough for the ETag and cursors
+    without loading titles and bodies.
+    """
+    query = select(
+        Post.id,
+        Post.created_at,
+        func.coalesce(Post.updated_at, Post.created_at).label("modified_at")
+    ).where(Post.user_id == user_id)
+    return await paginate_keyset(
+        db, query, Post.created_at, Post.id, cursor, limit, descending=True
+    )
+
+
+async def fetch_posts_by_ids(db: AsyncSession, post_ids: List[int]) -> List[Post]:
+    """Posts by primary key, in the order of `post_ids`"""
+    if not post_ids:
+        return []
+    result = await db.execute(select(Post).where(Post.id.in_(post_ids)))
+    posts = {post.id: post for post in result.scalars()}
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+async def fetch_user_post_count(db: AsyncSession, user_id: int) -> int:
+    """A user's post total from the maintained users.post_count counter"""
+    result = await db.execute(select(User.post_count).where(User.id == user_id))
+    return result.scalar_one_or_none() or 0
+
+
+def _search_filter(query: str):
+    """Case-insensitive substring match on title or body, as a SQL expression"""
+    return or_(
+        Post.title.icontains(query, autoescape=True),
+        Post.body.icontains(query, autoescape=True),
+    )
+
+
+async def apply_post_search(db: AsyncSession, query, search: Optional[str]):
+    """Restrict a posts query to matches for `search` (full-text index when installed)"""
+    if not search:
+        return query
+    backend = await get_search_backend(db)
+    return query.where(fulltext_filter(backend, search) if backend else _search_filter(search))
+
+
+async def query_external_posts(
+    db: AsyncSession,
+    page: int,
+    size: int,
+    search: Optional[str] = None
+) -> Tuple[List[ExternalPost], int]:
+    """Fetch one page of posts, filtering, counting and slicing in the database"""
+    if search:
+        # Use the ranked full-text index when installed, else a substring scan
+        backend = await get_search_backend(db)
+        if backend:
+            return await search_posts_fulltext(db, backend, search, page, size)
+
+    count_query = select(func.count()).select_from(Post)
+    if search:
+        count_query = count_query.where(_search_filter(search))
+    total = (await db.execute(count_query)).scalar_one()
+
+    offset = (page - 1) * size
+    if offset >= total:
+        return [], total
+
+    query = select(Post.user_id, Post.id, Post.title, Post.body)
+    if search:
+        query = query.where(_search_filter(search))
+    query = query.order_by(Post.id).offset(offset).limit(size)
+    result = await db.execute(query)
+
+    posts = [
+        ExternalPost(userId=row.user_id, id=row.id, title=row.title, body=row.body)
+        for row in result
+    ]
+    return posts, total
+
+
+async def query_external_posts_keyset(
+    db: AsyncSession,
+    cursor: Optional[str],
+    limit: int,
+    search: Optional[str] = None
+) -> KeysetPage:
+    """Fetch one page of posts ordered by (created_at, id) using a signed cursor"""
+    query = select(Post.user_id, Post.id, Post.title, Post.body, Post.created_at)
+    # Keyset order wins over relevance here; the index is only used to filter
+    query = await apply_post_search(db, query, search)
+
+    page = await paginate_keyset(db, query, Post.created_at, Post.id, cursor, limit)
+    posts = [
+        ExternalPost(userId=row.user_id, id=row.id, title=row.title, body=row.body)
+        for row in page.items
     ]
+    return page._replace(items=posts)
+
+
+# ----------------- BULK INSERT -----------------
+def _format_validation_error(error: dict) -> str:
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+async def record_new_posts(db: AsyncSession, user_id: int, count: int, newest_at: datetime) -> None:
+    """
+    Add `count` new posts to the author's post_count/last_post_at. Runs in
+    the caller's transaction so the counters commit (or roll back) together
+    with the posts; the increment happens in SQL so concurrent writers add up.
+    """
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            post_count=User.post_count + count,
+            last_post_at=case(
+                (or_(User.last_post_at.is_(None), User.last_post_at < newest_at), newest_at),
+                else_=User.last_post_at
+            )
+        )
+    )
+
+
+async def ingest_posts(
+    db: AsyncSession,
+    user_id: int,
+    items: AsyncIterator[Any],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> PostBulkResult:
+    """
+    Validate raw post payloads and insert the valid ones for `user_id`,
+    `chunk_size` rows per executemany INSERT ... RETURNING. Items that fail
+    to parse (passed in as exceptions) or validate are reported by index.
+    Everything, including the author's post counters, is committed in one
+    transaction at the end.
+    """
+    statement = insert(Post).returning(Post.id, sort_by_parameter_order=True)
+    ids: List[int] = []
+    errors: List[PostBulkError] = []
+    pending: List[dict] = []
+
+    newest_at: Optional[datetime] = None
+
+    async def flush():
+        nonlocal newest_at
+        newest_at = datetime.utcnow()
+        for row in pending:
+            row["created_at"] = newest_at
+        result = await db.execute(statement, pending)
+        ids.extend(result.scalars().all())
+        pending.clear()
+
+    index = 0
+    async for item in items:
+        if index >= BULK_MAX_ITEMS:
+            raise BulkLimitExceeded(f"At most {BULK_MAX_ITEMS} posts per request")
+        if isinstance(item, Exception):
+            errors.append(PostBulkError(index=index, errors=[str(item)]))
+        else:
+            try:
+                post = PostCreate.model_validate(item)
+            except ValidationError as exc:
+                errors.append(PostBulkError(
+                    index=index,
+                    errors=[_format_validation_error(error) for error in exc.errors()]
+                ))
+            else:
+                pending.append({"title": post.title, "body": post.body, "user_id": user_id})
+                if len(pending) >= chunk_size:
+                    await flush()
+        index += 1
+
+    if pending:
+        await flush()
+    if ids:
+        await record_new_posts(db, user_id, len(ids), newest_at)
+    await db.commit()
+    return PostBulkResult(created=len(ids), failed=len(errors), ids=ids, errors=errors)
 
 
 async def fetch_external_post_by_id(post_id: int) -> Optional[ExternalPost]:
-    """Fetch a single external post by ID"""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{POSTS_API_URL}/{post_id}")
-        if response.status_code == 404:
-            return None
-        response.raise_for_status()
-        data = response.json()
+    """
+    Fetch a single external post by ID through the shared upstream client
+    (pooled connections, cache, retries and circuit breaker)
+    """
+    data = await upstream.get_json(f"{POSTS_API_PATH}/{post_id}")
+    if data is None:
+        return None
     return ExternalPost(**data)
 
-
-# ----------------- SEARCH -----------------
-def search_posts(posts: List[ExternalPost], query: str) -> List[ExternalPost]:
-    """Search posts by title or body (case-insensitive)"""
-    query_lower = query.lower()
-    filtered = []
-    for post in posts:
-        title = getattr(post, "title", "") or ""
-        body = getattr(post, "body", "") or ""
-        if query_lower in title.lower() or query_lower in body.lower():
-            filtered.append(post)
-    return filtered
-
-
-# ----------------- PAGINATION -----------------
-def paginate_posts(posts: List[ExternalPost], page: int, size: int) -> Tuple[List[ExternalPost], int]:
-    """Paginate the posts list safely"""
-    total = len(posts)
-    start = (page - 1) * size
-    end = start + size
-    paginated = posts[start:end] if start < total else []
-    return paginated, total
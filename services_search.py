@@ -0,0 +1,159 @@
+# services_search.py
+import re
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import false, func, literal_column, select, table, column, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Post
+from schemas_post import ExternalPost
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# Title matches count more than body matches (same weighting on both backends)
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+# Decimals kept in a result's rank. Python writes floats below 1e-4 in exponent
+# form (1e-06) where orjson and pydantic write 1e-6; at 4 decimals a rank is
+# either 0.0 or spelled the same by every JSON encoder the API uses
+RANK_DECIMALS = 4
+
+# Whether the full-text index exists, per database URL (checked once per process)
+_backend_cache: Dict[str, Optional[str]] = {}
+
+_posts_fts = table("posts_fts", column("rowid"))
+_fts = literal_column("posts_fts")
+_search_vector = literal_column("posts.search_vector")
+_pg_config = literal_column("'english'::regconfig")
+
+
+async def get_search_backend(db: AsyncSession) -> Optional[str]:
+    """Return the dialect name if its full-text index is installed, else None"""
+    bind = db.get_bind()
+    key = str(bind.url)
+    if key not in _backend_cache:
+        dialect = bind.dialect.name
+        if dialect == "sqlite":
+            probe = text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+            )
+        elif dialect == "postgresql":
+            probe = text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'posts' AND column_name = 'search_vector'"
+            )
+        else:
+            probe = None
+        found = probe is not None and (await db.execute(probe)).first() is not None
+        _backend_cache[key] = dialect if found else None
+    return _backend_cache[key]
+
+
+def to_fts5_query(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _to_external_post(row) -> ExternalPost:
+    return ExternalPost(
+        userId=row.user_id,
+        id=row.id,
+        title=row.title,
+        body=row.body,
+        rank=round(row.score, RANK_DECIMALS),
+        highlight=row.highlight
+    )
+
+
+async def _search_sqlite(
+    db: AsyncSession, query: str, page: int, size: int
+) -> Tuple[List[ExternalPost], int]:
+    fts_query = to_fts5_query(query)
+    if fts_query is None:
+        return [], 0
+    match = _fts.op("MATCH")(fts_query)
+
+    count_query = select(func.count()).select_from(_posts_fts).where(match)
+    total = (await db.execute(count_query)).scalar_one()
+    offset = (page - 1) * size
+    if offset >= total:
+        return [], total
+
+    # bm25() is "lower is better"; negate it so rank grows with relevance
+    score = (-func.bm25(_fts, TITLE_WEIGHT, BODY_WEIGHT)).label("score")
+    highlight = func.snippet(
+        _fts, -1, HIGHLIGHT_START, HIGHLIGHT_END, "…", 16
+    ).label("highlight")
+    rows_query = (
+        select(Post.user_id, Post.id, Post.title, Post.body, score, highlight)
+        .select_from(_posts_fts.join(Post, Post.id == _posts_fts.c.rowid))
+        .where(match)
+        .order_by(score.desc(), Post.id)
+        .offset(offset)
+        .limit(size)
+    )
+    result = await db.execute(rows_query)
+    return [_to_external_post(row) for row in result], total
+
+
+async def _search_postgresql(
+    db: AsyncSession, query: str, page: int, size: int
+) -> Tuple[List[ExternalPost], int]:
+    tsquery = func.websearch_to_tsquery(_pg_config, query)
+    match = _search_vector.op("@@")(tsquery)
+
+    count_query = select(func.count()).select_from(Post).where(match)
+    total = (await db.execute(count_query)).scalar_one()
+    offset = (page - 1) * size
+    if offset >= total:
+        return [], total
+
+    # Rank and slice first, then build headlines only for the rows on the page
+    score = func.ts_rank_cd(_search_vector, tsquery).label("score")
+    ranked = (
+        select(Post.id, score)
+        .where(match)
+        .order_by(score.desc(), Post.id)
+        .offset(offset)
+        .limit(size)
+        .subquery()
+    )
+    highlight = func.ts_headline(
+        _pg_config,
+        Post.body,
+        tsquery,
+        f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2"
+    ).label("highlight")
+    rows_query = (
+        select(Post.user_id, Post.id, Post.title, Post.body, ranked.c.score, highlight)
+        .join_from(ranked, Post, Post.id == ranked.c.id)
+        .order_by(ranked.c.score.desc(), Post.id)
+    )
+    result = await db.execute(rows_query)
+    return [_to_external_post(row) for row in result], total
+
+
+def fulltext_filter(backend: str, query: str):
+    """WHERE clause matching posts against the full-text index, without ranking"""
+    if backend == "sqlite":
+        fts_query = to_fts5_query(query)
+        if fts_query is None:
+            return false()
+        matching_ids = select(_posts_fts.c.rowid).where(_fts.op("MATCH")(fts_query))
+        return Post.id.in_(matching_ids)
+    return _search_vector.op("@@")(func.websearch_to_tsquery(_pg_config, query))
+
+
+async def search_posts_fulltext(
+    db: AsyncSession,
+    backend: str,
+    query: str,
+    page: int,
+    size: int
+) -> Tuple[List[ExternalPost], int]:
+    """Ranked, highlighted full-text search over post titles and bodies"""
+    if backend == "sqlite":
+        return await _search_sqlite(db, query, page, size)
+    return await _search_postgresql(db, query, page, size)
@@ -0,0 +1,82 @@
+# singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import object_session
+from database import has_recent_writes
+
+T = TypeVar("T")
+
+
+class _LeaderCancelled(Exception):
+    """The call the others were waiting on was cancelled; they run their own"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for `key` is in
+    flight, later callers await its result instead of starting another.
+    Nothing is cached; the key is forgotten as soon as the call finishes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is not None:
+            self.shared += 1
+            try:
+                # Shielded so a cancelled follower does not cancel the leader's result
+                return await asyncio.shield(call)
+            except _LeaderCancelled:
+                return await fn()
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        self.executed += 1
+        try:
+            result = await fn()
+        except BaseException as exc:
+            call.set_exception(_LeaderCancelled() if isinstance(exc, asyncio.CancelledError) else exc)
+            call.exception()  # mark retrieved: without followers nobody else reads it
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executed": self.executed, "shared": self.shared}
+
+
+flight = SingleFlight()
+
+
+async def coalesced_lookup(
+    db: AsyncSession,
+    key: Hashable,
+    fn: Callable[[], Awaitable[Optional[Any]]]
+) -> Optional[Any]:
+    """
+    Single-flight an ORM lookup that returns one instance (or None/a scalar).
+    Followers receive the leader's instance merged into their own session
+    without another query. Sessions that just wrote skip coalescing so they
+    never get the result of a read that started before their write.
+    """
+    if has_recent_writes(db):
+        return await fn()
+    result = await flight.do(key, fn)
+    if result is None or not hasattr(result, "_sa_instance_state"):
+        return result
+    if object_session(result) is db.sync_session:
+        return result
+    if inspect(result).modified:
+        # The leader already changed its copy; load a clean one
+        return await fn()
+    return await db.merge(result, load=False)
@@ -0,0 +1,266 @@
+# upstream.py
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Set, Tuple
+from dotenv import load_dotenv
+from cache import TTLCache
+from singleflight import flight
+
+if TYPE_CHECKING:
+    import httpx
+
+load_dotenv()
+
+UPSTREAM_BASE_URL = os.getenv("UPSTREAM_BASE_URL", "https://jsonplaceholder.typicode.com")
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 5))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", 2))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 50))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", 20))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", 30))
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]"); HTTP/1.1 otherwise
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "true").lower() in ("1", "true", "yes")
+# Retries after the first attempt, with full-jitter exponential backoff
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 2))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", 0.1))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", 2))
+# Responses are fresh for CACHE_TTL, then served stale (and refreshed in the background) for STALE_TTL
+UPSTREAM_CACHE_SIZE = int(os.getenv("UPSTREAM_CACHE_SIZE", 1024))
+UPSTREAM_CACHE_TTL = float(os.getenv("UPSTREAM_CACHE_TTL", 60))
+UPSTREAM_STALE_TTL = float(os.getenv("UPSTREAM_STALE_TTL", 300))
+# Consecutive failures that open the breaker, and how long it stays open
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", 5))
+UPSTREAM_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", 30))
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when the upstream API fails or its circuit breaker is open"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for
+    `reset_after` seconds; then lets one trial call through (half-open)
+    and closes again if it succeeds. Only the call that allow() granted
+    the trial can close the breaker or end the trial, so requests admitted
+    before it opened cannot skip the trial or let a second one through.
+    Failures are 5xx answers, timeouts and transport errors; any other
+    answer, 4xx included, means the upstream is up.
+    """
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(self.reset_after - (time.monotonic() - self.opened_at), 0.0)
+
+    def allow(self) -> Tuple[bool, bool]:
+        """(allowed, trial); a trial call must finish with end_trial()"""
+        state = self.state
+        if state == "closed":
+            return True, False
+        if state == "half_open" and not self.trial_running:
+            self.trial_running = True
+            return True, True
+        self.rejected += 1
+        return False, False
+
+    def record_success(self, trial: bool = False) -> None:
+        if self.opened_at is not None and not trial:
+            # Admitted before the breaker opened: says nothing about the upstream now
+            return
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, trial: bool = False) -> None:
+        self.failures += 1
+        if trial or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def end_trial(self) -> None:
+        self.trial_running = False
+
+
+# Cached marker for "upstream answered 404"
+_NOT_FOUND = object()
+
+
+class UpstreamClient:
+    """
+    Application-scoped HTTP client for the upstream posts API: one pooled
+    httpx.AsyncClient (keep-alive, HTTP/2 when available, timeouts) shared
+    by every request, with retries, a stale-while-revalidate response cache
+    and a circuit breaker. Pass `transport` (e.g. httpx.MockTransport) to
+    run against a local stub instead of the network.
+    The client (and httpx itself) is created on the first upstream request.
+    """
+
+    def __init__(self, base_url: str, transport: Optional["httpx.AsyncBaseTransport"] = None):
+        self.base_url = base_url
+        self.transport = transport
+        self.breaker = CircuitBreaker(UPSTREAM_BREAKER_THRESHOLD, UPSTREAM_BREAKER_RESET)
+        # key -> (fetched_at, data); kept past freshness so stale entries can still be served
+        self.cache = TTLCache(maxsize=UPSTREAM_CACHE_SIZE, ttl=UPSTREAM_CACHE_TTL + UPSTREAM_STALE_TTL)
+        self.requests = 0
+        self.retries = 0
+        self.stale_served = 0
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    def _http2(self) -> bool:
+        return UPSTREAM_HTTP2 and self.transport is None and importlib.util.find_spec("h2") is not None
+
+    async def start(self) -> None:
+        if self._client is not None:
+            return
+        import httpx
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            transport=self.transport,
+            http2=self._http2(),
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+            )
+        )
+
+    async def close(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+    async def _fetch(self, path: str) -> Any:
+        """GET `path` with retries; returns the JSON body or _NOT_FOUND"""
+        import httpx
+        allowed, trial = self.breaker.allow()
+        if not allowed:
+            raise UpstreamUnavailable("Upstream circuit is open", self.breaker.retry_after())
+        if self._client is None:
+            await self.start()
+
+        try:
+            error = "no attempt made"
+            failed = True
+            for attempt in range(UPSTREAM_RETRIES + 1):
+                if attempt:
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt - 1))
+                self.requests += 1
+                try:
+                    response = await self._client.get(path)
+                except httpx.TransportError as exc:  # connect/read timeouts, resets, ...
+                    error, failed = repr(exc), True
+                    continue
+                if response.status_code in RETRY_STATUS_CODES:
+                    error, failed = f"HTTP {response.status_code}", response.status_code >= 500
+                    continue
+                # The upstream answered; only a 5xx counts against the breaker
+                if response.status_code >= 500:
+                    self.breaker.record_failure(trial)
+                else:
+                    self.breaker.record_success(trial)
+                if response.status_code == 404:
+                    return _NOT_FOUND
+                if response.status_code >= 400:
+                    # Other client/server errors will not get better by retrying
+                    raise UpstreamUnavailable(f"Upstream returned HTTP {response.status_code}")
+                try:
+                    return response.json()
+                except ValueError:
+                    raise UpstreamUnavailable("Upstream returned invalid JSON")
+
+            # Still rate limited (429) after the retries: up, but not answering us
+            if failed:
+                self.breaker.record_failure(trial)
+            else:
+                self.breaker.record_success(trial)
+            raise UpstreamUnavailable(f"Upstream request failed: {error}", self.breaker.retry_after() or 1.0)
+        finally:
+            # Also when cancelled: a half-open trial must not leave the breaker waiting forever
+            if trial:
+                self.breaker.end_trial()
+
+    async def _refresh(self, path: str) -> Any:
+        async def fetch_and_store():
+            data = await self._fetch(path)
+            self.cache.set(path, (time.monotonic(), data))
+            return data
+
+        # Concurrent misses for the same path share one upstream request
+        return await flight.do(("upstream", path), fetch_and_store)
+
+    def _refresh_in_background(self, path: str) -> None:
+        if path in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(path))
+        self._refreshing[path] = task
+        self._background.add(task)
+
+        def _done(finished: asyncio.Task) -> None:
+            self._refreshing.pop(path, None)
+            self._background.discard(finished)
+            if not finished.cancelled():
+                finished.exception()  # failures keep the stale copy; mark them retrieved
+
+        task.add_done_callback(_done)
+
+    async def get_json(self, path: str) -> Optional[Any]:
+        """Cached GET of `path`; None when the upstream says 404"""
+        entry = self.cache.get(path)
+        if entry is not None:
+            fetched_at, data = entry
+            if time.monotonic() - fetched_at >= UPSTREAM_CACHE_TTL:
+                # Stale: answer now and refresh behind the response
+                self.stale_served += 1
+                self._refresh_in_background(path)
+        else:
+            data = await self._refresh(path)
+        return None if data is _NOT_FOUND else data
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": self._http2(),
+            "requests": self.requests,
+            "retries": self.retries,
+            "stale_served": self.stale_served,
+            "cache": self.cache.stats(),
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "rejected": self.breaker.rejected
+            }
+        }
+
+
+upstream = UpstreamClient(UPSTREAM_BASE_URL)